@@ -0,0 +1,155 @@
+import os
+import re
+import threading
+from time import perf_counter
+import numpy as np
+
+from constants import consts as c
+from history import history
+from items import item_manager as im
+from journal import ADD, REMOVE, ROTATE, SET_RECIPE, REMOVE_ITEM, journal
+import save
+from structures.production.factory import Factory
+from structures.scheduler import scheduler
+from structures.structure import structure_manager as sm
+from tracing import tracer
+from ui.game_ui import ui
+
+"""
+    Periodic autosave that doesn't hold up the frame, and crash recovery. Between two ticks the
+    main thread only captures the state into new arrays, which the simulation never writes to
+    afterwards, and a worker thread compresses them and writes the file while the game keeps
+    running. The file is written under a temporary name and renamed over the previous autosave,
+    so a crash mid-write leaves the last complete one in place.
+
+    Each autosave is also a checkpoint of the journal (journal.py). Taking one starts a new
+    journal file, numbered one higher, and once the checkpoint is on disk the journals before it
+    are deleted. A game that exits normally writes a last checkpoint and deletes its journal, so
+    a journal left behind means the game crashed: the next start loads the checkpoint and replays
+    the journals from its number on. Replaying re-applies the player's changes to the factory as
+    it was at the checkpoint, production since then is not re-simulated.
+"""
+
+AUTOSAVE = os.path.join(save.SAVE_DIR, "autosave.npz")
+JOURNAL = os.path.join(save.SAVE_DIR, "journal-{:06d}.bin")
+
+
+class Autosave:
+    def __init__(self):
+        self.enabled = False
+        self.last = perf_counter()
+        self.worker = None
+        self.sequence = 0  # number of the journal that continues from the latest checkpoint
+
+    def begin(self):
+        """ Recover from a crash if the last game left a journal, then take the first checkpoint. Returns the operations replayed, if any. """
+        self.enabled = True
+        journals = self.journals()
+        self.sequence = max(journals, default=0)
+
+        replayed = None
+        if journals and os.path.exists(AUTOSAVE):
+            replayed = self.recover()
+        self.start()
+        return replayed
+
+    def end(self):
+        """ Write a last checkpoint when the game exits normally, leaving no journal behind. """
+        self.wait()
+        self.start()
+        self.wait()
+        file_path = journal.file_path
+        journal.close()
+        os.remove(file_path)
+
+    def update(self):
+        """ Start an autosave when one is due, called between ticks. """
+        if not self.enabled or perf_counter() - self.last < c.autosave_interval:
+            return
+        if self.worker is not None and self.worker.is_alive():
+            return
+
+        self.start()
+
+    def start(self):
+        self.wait()
+        self.last = perf_counter()
+        with tracer.span("autosave capture", "save"):
+            arrays = save.capture()
+
+        # operations from now on go to a new journal, continuing from this checkpoint
+        self.sequence += 1
+        arrays["journal"] = np.array(self.sequence)
+        os.makedirs(save.SAVE_DIR, exist_ok=True)
+        journal.open(JOURNAL.format(self.sequence))
+
+        self.worker = threading.Thread(target=self.write, args=(arrays, self.sequence), name="autosave", daemon=True)
+        self.worker.start()
+
+    def write(self, arrays, sequence):
+        try:
+            with tracer.span("autosave write", "save"):
+                save.write(arrays, AUTOSAVE)
+            # the checkpoint now holds everything the older journals recorded
+            for older in self.journals():
+                if older < sequence:
+                    os.remove(JOURNAL.format(older))
+        except OSError as error:
+            ui.show(f"Autosave to {AUTOSAVE} failed: {error}")
+
+    def wait(self):
+        """ Block until the autosave being written, if any, is on disk. """
+        if self.worker is not None:
+            self.worker.join()
+
+    def journals(self):
+        """ Numbers of the journal files in the save directory. """
+        if not os.path.isdir(save.SAVE_DIR):
+            return []
+        matches = [re.fullmatch(r"journal-(\d+)\.bin", name) for name in os.listdir(save.SAVE_DIR)]
+        return sorted(int(match.group(1)) for match in matches if match)
+
+    def recover(self):
+        """ Load the autosave and replay the journals written since it, returning how many operations were replayed. """
+        with np.load(AUTOSAVE, allow_pickle=False) as file:
+            arrays = {name: file[name] for name in file.files}
+        save.restore(arrays)
+
+        replayed = 0
+        for sequence in self.journals():
+            if sequence >= int(arrays["journal"]):
+                records = journal.read(JOURNAL.format(sequence))
+                replay(records)
+                replayed += len(records)
+        # what was recovered can't be undone
+        history.clear()
+        return replayed
+
+
+def replay(records):
+    """ Apply journal records to the factory, quietly and without recording them again. """
+    columns = [records[name].tolist() for name in ["op", "row", "col", "value", "direction", "length"]]
+    for op, row, col, value, direction, length in zip(*columns):
+        if op == ADD:
+            # add on an occupied cell would open the recipe selection of a factory there
+            if sm.grid[row][col] == 0:
+                ug_state, c.ug_state = c.ug_state, length
+                sm.add(row, col, value, direction, quiet=True)
+                c.ug_state = ug_state
+        elif op == REMOVE:
+            sm.remove(row, col, quiet=True)
+        elif op == ROTATE:
+            sm.rotate(row, col, direction, quiet=True)
+        elif op == SET_RECIPE:
+            factory = sm.grid[row][col]
+            if isinstance(factory, Factory):
+                if value < 0:
+                    factory.clear_recipe()
+                else:
+                    factory.set_recipe(value)
+                scheduler.wake(factory)
+        elif op == REMOVE_ITEM:
+            im.remove(row, col)
+
+
+autosave = Autosave()
@@ -0,0 +1,102 @@
+from collections import OrderedDict
+import pygame as pg
+
+from camera import camera
+from constants import consts as c
+
+"""
+    Pre-rendered background of the world, one surface per grid chunk, holding everything that
+    only changes when the player builds: the gridlines, the ore and the sprites of static
+    structures (belts, undergrounds, splitters). A frame blits the few chunk surfaces on screen
+    instead of drawing every cell, and a chunk is only redrawn after a structure in it was added,
+    removed or rotated, or when the zoom changes. A cell that runs out of ore is painted over on
+    the chunk's surface rather than redrawing the chunk.
+"""
+
+
+class Background:
+    def __init__(self):
+        self.surfaces = OrderedDict()  # chunk coordinate -> surface, least recently drawn first
+        self.settings = None
+
+    def render(self, sm, w):
+        # a zoom change or toggling the gridlines changes every chunk
+        settings = (c.cell_length, c.show_gridlines)
+        if settings != self.settings:
+            self.surfaces.clear()
+            self.settings = settings
+
+        chunk_length = c.chunk_size * c.cell_length
+        visible = camera.visible_chunks(0)
+        for chunk in visible:
+            surface = self.surfaces.get(chunk)
+            if surface is None:
+                surface = self.build(chunk, sm, w)
+                self.surfaces[chunk] = surface
+            self.surfaces.move_to_end(chunk)
+            c.screen.blit(surface, (chunk[1] * chunk_length - c.player_x, chunk[0] * chunk_length - c.player_y))
+
+        # keep some chunks around for panning back, but not the whole explored world
+        while len(self.surfaces) > 2 * len(visible):
+            self.surfaces.popitem(last=False)
+
+    def build(self, chunk, sm, w):
+        chunk_row, chunk_col = chunk
+        first_row, first_col = chunk_row * c.chunk_size, chunk_col * c.chunk_size
+        chunk_length = c.chunk_size * c.cell_length
+
+        surface = pg.Surface((chunk_length, chunk_length), 0, c.screen)
+        surface.fill(c.bg_color)
+
+        if c.show_gridlines:
+            for col in range(max(first_col, 0), min(first_col + c.chunk_size, c.num_cells)):
+                x = (col - first_col) * c.cell_length
+                pg.draw.line(surface, c.grid_color, (x, 0), (x, chunk_length))
+            for row in range(max(first_row, 0), min(first_row + c.chunk_size, c.num_cells)):
+                y = (row - first_row) * c.cell_length
+                pg.draw.line(surface, c.grid_color, (0, y), (chunk_length, y))
+
+        rows, cols, ores = w.ores(chunk_row, chunk_col)
+        for row, col, ore in zip(rows.tolist(), cols.tolist(), ores.tolist()):
+            x = (col - first_col) * c.cell_length
+            y = (row - first_row) * c.cell_length
+            pg.draw.rect(surface, c.ore_colors[ore], (x, y, c.cell_length, c.cell_length))
+
+        # static structures draw themselves as usual, onto the chunk instead of the screen
+        screen, player_x, player_y = c.screen, c.player_x, c.player_y
+        c.screen, c.player_x, c.player_y = surface, first_col * c.cell_length, first_row * c.cell_length
+        try:
+            for structure in sm.chunk_structures.get(chunk, {}):
+                if structure.static:
+                    structure.render()
+        finally:
+            c.screen, c.player_x, c.player_y = screen, player_x, player_y
+
+        return surface
+
+    def clear_ore(self, row, col):
+        """ Paint a mined out cell back to bare ground, on the surface of its chunk if that is cached. """
+        shift = c.chunk_size.bit_length() - 1
+        surface = self.surfaces.get((row >> shift, col >> shift))
+        if surface is None:
+            return
+
+        # mines aren't static, so nothing cached is drawn over the ore
+        x = (col & (c.chunk_size - 1)) * c.cell_length
+        y = (row & (c.chunk_size - 1)) * c.cell_length
+        surface.fill(c.bg_color, (x, y, c.cell_length, c.cell_length))
+        if c.show_gridlines:
+            if 0 <= col < c.num_cells:
+                pg.draw.line(surface, c.grid_color, (x, y), (x, y + c.cell_length - 1))
+            if 0 <= row < c.num_cells:
+                pg.draw.line(surface, c.grid_color, (x, y), (x + c.cell_length - 1, y))
+
+    def invalidate(self, row, col):
+        shift = c.chunk_size.bit_length() - 1
+        self.surfaces.pop((row >> shift, col >> shift), None)
+
+    def clear(self):
+        self.surfaces.clear()
+
+
+background = Background()
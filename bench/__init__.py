@@ -0,0 +1,3 @@
+"""
+    Headless benchmarks of the simulation. Run `python -m bench` from the repository root.
+"""
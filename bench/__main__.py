@@ -0,0 +1,126 @@
+import headless  # noqa: F401, selects the dummy SDL drivers before pygame is initialised
+
+import json
+import sys
+from argparse import ArgumentParser
+
+from bench.layouts import LAYOUTS
+from bench import compare, overhead
+from bench.runner import format_table, run_case, run_isolated
+
+SCALES = [100, 1000, 10000]
+
+
+def run_isolated_case(layout, scale, args):
+    """ Run one case in a fresh interpreter, so no state leaks from one case into the next. """
+    arguments = ["run", layout, str(scale), "--ticks", str(args.ticks), "--warmup", str(args.warmup)]
+    if args.render:
+        arguments.append("--render")
+    return run_isolated(arguments)
+
+
+def suite(args):
+    results = []
+    for layout in args.layouts:
+        for scale in args.scales:
+            results.append(run_isolated_case(layout, scale, args))
+            print(f"{layout} x {scale}: {results[-1]['ticks_per_second']:.0f} ticks/s", file=sys.stderr)
+
+    print(format_table(results))
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+def compare_with_baseline(args):
+    try:
+        baseline = None if args.save else compare.load_baseline(args.against)
+    except ValueError as error:
+        sys.exit(str(error))
+
+    samples = compare.collect(args.scenarios, args.repeat)
+    if args.save:
+        print(f"saved baseline {compare.save_baseline(samples)}")
+        return
+
+    if baseline["dirty"]:
+        print(f"note: the baseline for {baseline['commit'][:10]} was taken with uncommitted changes", file=sys.stderr)
+
+    rows = compare.compare(baseline, samples, args.threshold)
+    print(compare.format_comparison(rows))
+
+    slower = [row["phase"] for row in rows if row["verdict"] == "SLOWER"]
+    if slower:
+        sys.exit(f"{len(slower)} phase(s) more than {args.threshold:.0%} slower than {args.against}: {', '.join(slower)}")
+
+
+def contract_overhead(args):
+    results = [run_isolated(["contracts", "--measure"], {"PYFACTORY_CONTRACTS": mode}) for mode in ["0", "1"]]
+
+    methods = list(results[0]["ns_per_call"])
+    print(f"{'contracts':>10} {'calls':>9} {'wrapper frames':>15} {'ticks/s':>8}" + "".join(f" {method + ' ns':>28}" for method in methods))
+    for result in results:
+        print(
+            f"{'on' if result['contracts'] else 'off':>10} {result['calls']:>9} {result['wrapper_frames']:>15} {result['ticks_per_second']:>8.0f}"
+            + "".join(f" {result['ns_per_call'][method]:>28.0f}" for method in methods)
+        )
+
+    if results[0]["wrapper_frames"] > 0:
+        sys.exit("@typechecked left wrapper frames on the hot path with contracts off")
+
+
+def add_case_options(parser):
+    parser.add_argument("--ticks", type=int, default=1200, help="ticks to time after building and warming up")
+    parser.add_argument("--warmup", type=int, default=600, help="ticks to run first, so the belts fill up")
+    parser.add_argument("--render", action="store_true", help="also draw a frame every tick")
+
+
+def main():
+    parser = ArgumentParser(prog="python -m bench", description="Benchmark the simulation on scripted factory layouts.")
+    commands = parser.add_subparsers(dest="command")
+
+    suite_parser = commands.add_parser("suite", help="run every layout at every scale (the default)")
+    suite_parser.add_argument("--layouts", nargs="+", choices=list(LAYOUTS), default=list(LAYOUTS))
+    suite_parser.add_argument("--scales", nargs="+", type=int, default=SCALES, help="number of structures per case")
+    suite_parser.add_argument("--output", help="also write the results to this JSON file")
+    add_case_options(suite_parser)
+
+    run_parser = commands.add_parser("run", help="run a single case and print its result as JSON")
+    run_parser.add_argument("layout", choices=list(LAYOUTS))
+    run_parser.add_argument("scale", type=int)
+    add_case_options(run_parser)
+
+    scenario_parser = commands.add_parser("scenario", help="run one baseline scenario and print its phase timings as JSON")
+    scenario_parser.add_argument("scenario", choices=list(compare.SCENARIOS))
+
+    compare_parser = commands.add_parser("compare", help="compare against the baseline of a commit, failing on a regression")
+    compare_parser.add_argument("--against", default="HEAD", help="git revision whose baseline to compare against")
+    compare_parser.add_argument("--save", action="store_true", help="store the results as the baseline of HEAD instead")
+    compare_parser.add_argument("--scenarios", nargs="+", choices=list(compare.SCENARIOS), default=list(compare.SCENARIOS))
+    compare_parser.add_argument("--repeat", type=int, default=5, help="fresh processes per scenario")
+    compare_parser.add_argument("--threshold", type=float, default=0.05, help="slowdown that counts as a regression")
+
+    contracts_parser = commands.add_parser("contracts", help="check that @typechecked costs nothing with contracts off")
+    contracts_parser.add_argument("--measure", action="store_true", help="measure this process only and print it as JSON")
+
+    argv = sys.argv[1:]
+    if not argv or argv[0].startswith("-") and argv[0] not in ["-h", "--help"]:
+        argv.insert(0, "suite")
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        print(json.dumps(run_case(args.layout, args.scale, args.ticks, args.warmup, args.render)))
+    elif args.command == "scenario":
+        print(json.dumps(compare.SCENARIOS[args.scenario]()))
+    elif args.command == "compare":
+        compare_with_baseline(args)
+    elif args.command == "contracts":
+        if args.measure:
+            print(json.dumps(overhead.measure()))
+        else:
+            contract_overhead(args)
+    else:
+        suite(args)
+
+
+if __name__ == '__main__':
+    main()
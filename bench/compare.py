@@ -0,0 +1,176 @@
+import json
+import subprocess
+import threading
+from datetime import datetime, timezone
+from os import makedirs, path
+from time import perf_counter
+
+import numpy as np
+import pygame as pg
+
+from bench.layouts import build
+from bench.runner import ROOT, draw_frame, run_case, run_isolated
+from constants import consts as c
+from images import img as i
+from structures.structure import structure_manager as sm
+
+"""
+    Performance baselines. Every scenario is run several times, each in a fresh process, and the
+    per-phase samples are stored as JSON keyed by git commit. Comparing against a baseline bootstraps
+    a confidence interval for the relative change of each phase, and a phase has regressed when it is
+    significantly slower and its estimated slowdown is above the threshold.
+"""
+
+BASELINE_DIR = path.join(ROOT, ".bench")
+SCREEN_SIZE = (1280, 720)
+LAYOUT = "circuits"
+SCALE = 1000
+CONFIDENCE = 0.95
+
+
+def update_scenario():
+    return run_case(LAYOUT, SCALE, ticks=600)["phase_ms"]
+
+
+def render_scenario():
+    return {"frame": run_case(LAYOUT, SCALE, ticks=120, render=True, screen_size=SCREEN_SIZE)["phase_ms"]["render"]}
+
+
+def zoom_scenario():
+    """ Zoom out and back in a notch at a time, as with the mouse wheel, drawing the frame after each notch. """
+    c.set_screen(pg.display.set_mode(SCREEN_SIZE))
+    build(LAYOUT, SCALE)
+    draw_frame()
+
+    notches = [2] * 5 + [-2] * 10 + [2] * 5
+    elapsed = 0.0
+    for notch in notches * 2:
+        # neighbouring zoom levels are scaled in the background while the player is between notches
+        wait_for_prewarm()
+        start = perf_counter()
+        c.cell_length += notch
+        i.reload_images()
+        draw_frame()
+        elapsed += perf_counter() - start
+
+    return {"notch": 1000 * elapsed / (2 * len(notches))}
+
+
+def placement_scenario():
+    start = perf_counter()
+    build(LAYOUT, SCALE)
+    return {"structure": 1000 * (perf_counter() - start) / len(sm.structures)}
+
+
+SCENARIOS = {
+    "update": update_scenario,
+    "render": render_scenario,
+    "zoom": zoom_scenario,
+    "placement": placement_scenario,
+}
+
+
+def wait_for_prewarm():
+    for thread in threading.enumerate():
+        if thread.daemon and thread is not threading.current_thread():
+            thread.join()
+
+
+def collect(scenarios, repeat):
+    """ Run each scenario repeat times in fresh processes, returning {scenario: {phase: [ms, ...]}}. """
+    samples = {scenario: {} for scenario in scenarios}
+
+    # the scenarios take turns, so a slow patch of the machine doesn't land on just one of them
+    for _ in range(repeat):
+        for scenario in scenarios:
+            for phase, ms in run_isolated(["scenario", scenario]).items():
+                samples[scenario].setdefault(phase, []).append(ms)
+
+    return samples
+
+
+def git(*arguments):
+    return subprocess.run(["git", *arguments], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+
+
+def resolve(revision):
+    try:
+        return git("rev-parse", "--verify", revision + "^{commit}")
+    except subprocess.CalledProcessError:
+        raise ValueError(f"unknown git revision {revision!r}")
+
+
+def save_baseline(samples):
+    """ Store samples as the baseline of the checked out commit, returning the file written. """
+    commit = resolve("HEAD")
+    baseline = {
+        "commit": commit,
+        "dirty": git("status", "--porcelain", "--untracked-files=no") != "",
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "scenarios": samples,
+    }
+
+    makedirs(BASELINE_DIR, exist_ok=True)
+    file_path = path.join(BASELINE_DIR, commit + ".json")
+    with open(file_path, "w") as file:
+        json.dump(baseline, file, indent=2)
+    return file_path
+
+
+def load_baseline(revision):
+    commit = resolve(revision)
+    file_path = path.join(BASELINE_DIR, commit + ".json")
+    if not path.exists(file_path):
+        raise ValueError(f"no baseline for {revision} ({commit[:10]}), check it out and run python -m bench compare --save")
+
+    with open(file_path) as file:
+        return json.load(file)
+
+
+def compare(baseline, samples, threshold = 0.05, resamples = 10000):
+    """ Compare samples against a baseline, returning one row per phase the two have in common. """
+    rng = np.random.default_rng(0)
+    tails = [(1 - CONFIDENCE) / 2, (1 + CONFIDENCE) / 2]
+    rows = []
+
+    for scenario, phases in samples.items():
+        for phase, new in phases.items():
+            old = baseline["scenarios"].get(scenario, {}).get(phase)
+            if not old:
+                continue
+
+            old, new = np.array(old), np.array(new)
+            change = new.mean() / old.mean() - 1
+            resampled = rng.choice(new, (resamples, len(new))).mean(axis=1) / rng.choice(old, (resamples, len(old))).mean(axis=1) - 1
+            low, high = np.quantile(resampled, tails)
+
+            if low > 0 and change > threshold:
+                verdict = "SLOWER"
+            elif high < 0 and change < -threshold:
+                verdict = "faster"
+            else:
+                verdict = "same"
+
+            rows.append({
+                "phase": f"{scenario}.{phase}",
+                "baseline_ms": float(old.mean()),
+                "current_ms": float(new.mean()),
+                "change": float(change),
+                "interval": (float(low), float(high)),
+                "verdict": verdict,
+            })
+
+    return rows
+
+
+def format_comparison(rows):
+    lines = [["phase", "baseline ms", "current ms", "change", f"{CONFIDENCE:.0%} interval", ""]]
+    for row in rows:
+        low, high = row["interval"]
+        lines.append([
+            row["phase"], f"{row['baseline_ms']:.3f}", f"{row['current_ms']:.3f}",
+            f"{row['change']:+.1%}", f"{low:+.1%} .. {high:+.1%}", row["verdict"],
+        ])
+
+    widths = [max(len(line[k]) for line in lines) for k in range(len(lines[0]))]
+    return "\n".join("  ".join(cell.rjust(width) for cell, width in zip(line, widths)).rstrip() for line in lines)
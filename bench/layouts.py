@@ -0,0 +1,171 @@
+from id_mapping import id_map
+from items import item_manager as im
+from recipes import recipes
+from structures.scheduler import scheduler
+from structures.structure import structure_manager as sm
+from world import world as w
+
+"""
+    Scripted factory layouts for the benchmarks. Every layout repeats one module across the map,
+    placing it through StructureManager.add like a player would, until there are at least
+    `count` structures.
+
+    Nothing in the game consumes items, so a module marks source cells that are topped up with an
+    item and sink cells that are emptied between ticks. This keeps the factory flowing at a steady
+    rate instead of seizing up once every belt is full.
+"""
+
+UP, RIGHT, DOWN = 0, 1, 2
+MODULES_PER_ROW = 16
+
+sources = []  # (row, col, item id) of every source cell
+sinks = []    # (row, col) of every sink cell
+
+
+def place(row, col, structure, direction = RIGHT):
+    sm.add(row, col, id_map[structure], direction)
+    return sm.grid[row][col]
+
+
+def belt(row, col, length, direction = RIGHT, items = None):
+    """ Place a straight run of conveyors, optionally loading an item onto every cell. """
+    row_step, col_step = [(-1, 0), (0, 1), (1, 0)][direction]
+    for k in range(length):
+        place(row + k * row_step, col + k * col_step, "conveyor", direction)
+        if items is not None:
+            im.add(row + k * row_step, col + k * col_step, id_map[items])
+
+
+def source(row, col, item):
+    sources.append((row, col, id_map[item]))
+
+
+def sink(row, col):
+    sinks.append((row, col))
+
+
+def exchange():
+    """ Top up the source cells and empty the sink cells, returning how many items were sunk. """
+    for row, col, item in sources:
+        if im.grid[row][col] == 0:
+            im.add(row, col, item)
+
+    sunk = 0
+    for row, col in sinks:
+        if im.grid[row][col] != 0:
+            im.remove(row, col)
+            sunk += 1
+    return sunk
+
+
+def mine(row, col, ore, direction = RIGHT):
+    w.set_ore(row, col, id_map[ore])
+    return place(row, col, "mine", direction)
+
+
+def factory(row, col, recipe_name, direction = RIGHT):
+    # a recipe is set directly, adding on top of a factory would open the recipe selection
+    unit = place(row, col, "factory", direction)
+    unit.set_recipe(next(k for k, recipe in enumerate(recipes) if recipe["name"] == recipe_name))
+    scheduler.wake(unit)
+    return unit
+
+
+def mines_to_furnaces(row, col):
+    """ An ore mine feeding a belt, an arm loading a furnace, and a belt carrying the plates away. """
+    mine(row, col, "iron_ore" if (row + col) % 2 else "copper_ore")
+    belt(row, col + 1, 5)
+    place(row, col + 6, "arm")
+    place(row, col + 7, "furnace")
+    belt(row, col + 8, 4)
+    sink(row, col + 12)
+    return 2, 13
+
+
+def splitter_tree(row, col, depth = 3):
+    """ A pre-loaded feeder belt fanning out over 2 ** (depth + 1) output belts through a tree of splitters. """
+    root = row + 2 ** (depth + 1) - 1
+    belt(root, col, 12, items="iron")
+    source(root, col, "iron")
+    branch(root, col + 12, 0, depth)
+    return 2 ** (depth + 2), 12 + 2 * depth + 5
+
+
+def branch(row, col, level, depth):
+    place(row, col, "splitter")
+    if level == depth:
+        belt(row - 1, col + 1, 3)
+        belt(row + 1, col + 1, 3)
+        sink(row - 1, col + 4)
+        sink(row + 1, col + 4)
+        return
+
+    # children sit far enough apart that their own subtrees never touch
+    offset = 2 ** (depth - level)
+    belt(row - 1, col + 1, offset - 1, UP)
+    belt(row + 1, col + 1, offset - 1, DOWN)
+    place(row - offset, col + 1, "conveyor")
+    place(row + offset, col + 1, "conveyor")
+    branch(row - offset, col + 2, level + 1, depth)
+    branch(row + offset, col + 2, level + 1, depth)
+
+
+def underground_chain(row, col, links = 8):
+    """ A pre-loaded belt feeding a chain of underground belts laid end to end. """
+    belt(row, col, 6, items="copper")
+    source(row, col, "copper")
+    for k in range(links):
+        place(row, col + 6 + k * 4, "conveyor_underground")
+    belt(row, col + 6 + links * 4, 2)
+    sink(row, col + 6 + links * 4 + 2)
+    return 2, 6 + links * 4 + 3
+
+
+def circuit_factories(row, col):
+    """ Copper and iron smelted from ore, copper drawn into wire, and both crafted into circuits. """
+    mine(row, col, "copper_ore")
+    belt(row, col + 1, 1)
+    place(row, col + 2, "arm")
+    place(row, col + 3, "furnace")
+    belt(row, col + 4, 1)
+    place(row, col + 5, "arm")
+    factory(row, col + 6, "Wire")
+    belt(row, col + 7, 1)
+    place(row, col + 8, "arm")
+    factory(row, col + 9, "Circuit")
+    belt(row, col + 10, 1)
+    sink(row, col + 11)
+
+    mine(row + 2, col, "iron_ore")
+    belt(row + 2, col + 1, 1)
+    place(row + 2, col + 2, "arm")
+    place(row + 2, col + 3, "furnace")
+    belt(row + 2, col + 4, 6)
+    place(row + 1, col + 9, "arm", UP)
+    return 4, 12
+
+
+LAYOUTS = {
+    "furnaces": mines_to_furnaces,
+    "splitters": splitter_tree,
+    "undergrounds": underground_chain,
+    "circuits": circuit_factories,
+}
+
+
+def build(layout, count):
+    """ Repeat a layout's module, MODULES_PER_ROW to a row, until there are at least count structures. """
+    module = LAYOUTS[layout]
+    row = col = row_height = modules = 0
+
+    while len(sm.structures) < count:
+        if modules > 0 and modules % MODULES_PER_ROW == 0:
+            row, col, row_height = row + row_height, 0, 0
+
+        # each module returns the rows and columns it took, spacing included
+        height, width = module(row, col)
+        row_height = max(row_height, height)
+        col += width
+        modules += 1
+
+    return modules
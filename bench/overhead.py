@@ -0,0 +1,66 @@
+import sys
+from time import perf_counter
+from timeit import timeit
+
+import contracts
+from bench.layouts import build, exchange
+from id_mapping import id_map
+from items import Item, item_manager as im
+from structures.production.mine import Mine
+from structures.structure import structure_manager as sm
+
+"""
+    Measures what @typechecked costs. A profile hook counts every Python call made while the circuits
+    layout runs and how many of them entered a contracts.py wrapper, and a few of the hottest
+    decorated methods are timed directly. Without PYFACTORY_CONTRACTS the wrapper count has to be
+    zero, which is what the "contracts" benchmark asserts.
+"""
+
+CALLS = 100000
+
+
+def measure(ticks = 600):
+    build("circuits", 300)
+    for _ in range(600):
+        exchange()
+        sm.update()
+        im.update(sm)
+
+    calls = wrapper_frames = 0
+
+    def count_calls(frame, event, arg):
+        nonlocal calls, wrapper_frames
+        if event == "call":
+            calls += 1
+            if frame.f_code.co_filename == contracts.__file__:
+                wrapper_frames += 1
+
+    sys.setprofile(count_calls)
+    for _ in range(ticks):
+        exchange()
+        sm.update()
+        im.update(sm)
+    sys.setprofile(None)
+
+    start = perf_counter()
+    for _ in range(ticks):
+        exchange()
+        sm.update()
+        im.update(sm)
+    ticks_per_second = ticks / (perf_counter() - start)
+
+    mine = next(structure for structure in sm.structures if isinstance(structure, Mine))
+    item = Item(0, 0, id_map["iron"])
+    methods = {
+        "Item.move": lambda: item.move("right"),
+        "ProcessUnit.cycle_done": mine.cycle_done,
+        "ProcessUnit.is_buffer_full": mine.is_buffer_full,
+    }
+
+    return {
+        "contracts": contracts.ENABLED,
+        "calls": calls,
+        "wrapper_frames": wrapper_frames,
+        "ticks_per_second": ticks_per_second,
+        "ns_per_call": {name: 1e9 * timeit(method, number=CALLS) / CALLS for name, method in methods.items()},
+    }
@@ -0,0 +1,115 @@
+import json
+import os
+import resource
+import subprocess
+import sys
+import tracemalloc
+from os import path
+from time import perf_counter
+
+import pygame as pg
+
+from background import background
+from bench.layouts import build, exchange
+from constants import consts as c
+from items import item_manager as im
+from structures.scheduler import scheduler
+from structures.structure import structure_manager as sm
+from world import world as w
+
+"""
+    Runs one benchmark case: builds a layout at a given scale and advances it headless for a fixed
+    number of ticks, timing each phase of the tick separately. A case has to run in a fresh process,
+    as the structure and item managers are module-level singletons.
+"""
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+
+
+def run_isolated(arguments, environment = None):
+    """ Run python -m bench with the given arguments in a fresh interpreter, returning the JSON it prints last. """
+    env = {**os.environ, **(environment or {})}
+    output = subprocess.run([sys.executable, "-m", "bench", *arguments], cwd=ROOT, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_case(layout, count, ticks, warmup = 600, render = False, screen_size = (1280, 720)):
+    if render:
+        c.set_screen(pg.display.set_mode(screen_size))
+
+    # memory is traced while building and warming up only, tracing would skew the timings
+    tracemalloc.start()
+    start = perf_counter()
+    modules = build(layout, count)
+    build_seconds = perf_counter() - start
+    sunk = 0
+    for _ in range(warmup):
+        sunk += exchange()
+        sm.update()
+        im.update(sm)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    phases = {"structures": 0.0, "items": 0.0}
+    if render:
+        phases["render"] = 0.0
+
+    for _ in range(ticks):
+        sunk += exchange()
+        t0 = perf_counter()
+        sm.update()
+        t1 = perf_counter()
+        im.update(sm)
+        t2 = perf_counter()
+        phases["structures"] += t1 - t0
+        phases["items"] += t2 - t1
+
+        if render:
+            draw_frame()
+            phases["render"] += perf_counter() - t2
+
+    elapsed = sum(phases.values())
+    return {
+        "layout": layout,
+        "scale": count,
+        "structures": len(sm.structures),
+        "modules": modules,
+        "items": count_items(),
+        "sunk": sunk,
+        "active": len(scheduler.active),
+        "ticks": ticks,
+        "ticks_per_second": ticks / elapsed,
+        "build_seconds": build_seconds,
+        "phase_ms": {phase: 1000 * seconds / ticks for phase, seconds in phases.items()},
+        "peak_memory_mb": peak_memory / 2 ** 20,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10,
+    }
+
+
+def draw_frame():
+    c.screen.fill(c.bg_color)
+    background.render(sm, w)
+    sm.render()
+    im.render()
+
+
+def count_items():
+    # items riding transport lines are kept by their line, not in im.items
+    lines = getattr(im, "lines", None)
+    return len(im.items) + (sum(len(line.items) for line in lines.lines) if lines is not None else 0)
+
+
+def format_table(results):
+    phases = sorted({phase for result in results for phase in result["phase_ms"]}, key=["structures", "items", "render"].index)
+    header = ["layout", "scale", "structures", "items", "active", "ticks/s"] + [f"{phase} ms" for phase in phases] + ["peak MB", "rss MB"]
+    rows = [header]
+    for result in results:
+        rows.append([
+            result["layout"], str(result["scale"]), str(result["structures"]), str(result["items"]), str(result["active"]),
+            f"{result['ticks_per_second']:.0f}",
+            *(f"{result['phase_ms'][phase]:.3f}" if phase in result["phase_ms"] else "-" for phase in phases),
+            f"{result['peak_memory_mb']:.1f}", f"{result['max_rss_mb']:.0f}",
+        ])
+
+    widths = [max(len(row[k]) for row in rows) for k in range(len(header))]
+    return "\n".join("  ".join(cell.rjust(width) for cell, width in zip(row, widths)) for row in rows)
@@ -0,0 +1,64 @@
+import numpy as np
+
+from id_mapping import id_map
+from structures.production.factory import Factory
+from structures.scheduler import scheduler
+from structures.structure import STRUCTURE_NAMES
+
+"""
+    Blueprints, copies of a section of the factory that can be stamped down elsewhere. A blueprint
+    is a structured array with one record per structure: its cell relative to the top left corner
+    of the section, and what StructureManager.add_many needs to build it again. Stamping goes
+    through add_many, which registers all the structures in one pass, so a copied megabase is
+    placed without a separate add per structure.
+"""
+
+BLUEPRINT = np.dtype([
+    ("row", "<i4"),
+    ("col", "<i4"),
+    ("type", "i1"),
+    ("direction", "i1"),  # direction add has to be given
+    ("length", "i1"),     # underground length
+    ("recipe", "<i2"),    # recipe of a factory, -1 for none
+])
+
+
+def capture(sm, row0, col0, row1, col1):
+    """ Blueprint of the structures lying entirely within the rectangle with corners (row0, col0) and (row1, col1). """
+    first_row, last_row = min(row0, row1), max(row0, row1)
+    first_col, last_col = min(col0, col1), max(col0, col1)
+    rows, cols = np.mgrid[first_row:last_row + 1, first_col:last_col + 1]
+    occupied = sm.type_grid[rows, cols] != -1
+
+    # an underground covers two cells, each structure is listed once at the cell it is built from
+    structures = {}
+    for row, col in zip(rows[occupied].tolist(), cols[occupied].tolist()):
+        structures[sm.grid.get(row, col)] = None
+
+    records = []
+    for structure in structures:
+        cells = sm.cells_of(structure)
+        if not all(first_row <= row <= last_row and first_col <= col <= last_col for row, col in cells):
+            continue
+
+        recipe = structure.recipe if isinstance(structure, Factory) and structure.recipe is not None else -1
+        records.append((cells[0][0] - first_row, cells[0][1] - first_col, id_map[STRUCTURE_NAMES[type(structure)]],
+                        sm.built_direction(structure), getattr(structure, "length", 0), recipe))
+    return np.array(records, dtype=BLUEPRINT)
+
+
+def stamp(sm, blueprint, row, col, quiet = False):
+    """ Build a blueprint with its top left corner at (row, col), leaving out what doesn't fit. Returns the structures placed. """
+    cells = np.stack([blueprint["row"] + row, blueprint["col"] + col], axis=1)
+    placed = sm.add_many(cells, blueprint["type"], blueprint["direction"], blueprint["length"], quiet=quiet)
+
+    with_recipe = blueprint["recipe"] >= 0
+    if with_recipe.any():
+        built = set(placed)
+        for factory_row, factory_col, recipe in zip(cells[with_recipe, 0].tolist(), cells[with_recipe, 1].tolist(), blueprint["recipe"][with_recipe].tolist()):
+            factory = sm.grid.get(factory_row, factory_col)
+            if factory in built:
+                factory.set_recipe(recipe)
+                scheduler.wake(factory)
+    return placed
+
@@ -0,0 +1,40 @@
+from constants import consts as c
+
+"""
+    The region of the world currently on screen, derived from the player position, the screen
+    size and the zoom level. Render passes ask it which cells and chunks to draw, so the cost of a
+    frame follows the size of the screen rather than the size of the factory.
+"""
+
+
+class Camera:
+    def to_screen(self, x, y):
+        """ Convert a world position, measured in cells, to pixels on screen. """
+        return x * c.cell_length - c.player_x, y * c.cell_length - c.player_y
+
+    def visible_cells(self, margin = 1):
+        """ Return (first_row, last_row, first_col, last_col) of the cells on screen, end exclusive. """
+        # the margin keeps things that reach into neighbouring cells (arms, items mid-move) on screen
+        first_row = int(c.player_y // c.cell_length) - margin
+        first_col = int(c.player_x // c.cell_length) - margin
+        last_row = int((c.player_y + c.sh) // c.cell_length) + 1 + margin
+        last_col = int((c.player_x + c.sw) // c.cell_length) + 1 + margin
+        return first_row, last_row, first_col, last_col
+
+    def visible_chunks(self, margin = 1):
+        """ Return the coordinates of the grid chunks overlapping the screen. """
+        first_row, last_row, first_col, last_col = self.visible_cells(margin)
+        shift = c.chunk_size.bit_length() - 1
+        return [
+            (chunk_row, chunk_col)
+            for chunk_row in range(first_row >> shift, ((last_row - 1) >> shift) + 1)
+            for chunk_col in range(first_col >> shift, ((last_col - 1) >> shift) + 1)
+        ]
+
+    def is_visible(self, first_row, last_row, first_col, last_col, margin = 1):
+        """ Check if a block of cells (end exclusive) overlaps the screen. """
+        row0, row1, col0, col1 = self.visible_cells(margin)
+        return first_row < row1 and last_row > row0 and first_col < col1 and last_col > col0
+
+
+camera = Camera()
@@ -0,0 +1,354 @@
+import os
+import numpy as np
+
+from constants import consts as c
+
+"""
+    Sparse 2D grid stored as square chunks of c.chunk_size cells, keyed by chunk coordinate.
+    A chunk is only allocated the first time a value other than the fill is written into it,
+    and reads from anywhere else return the fill, so a layer only costs memory where the factory
+    actually is and coordinates are not limited to a fixed map (negative ones included).
+
+    Cells can be read and written as grid[row][col], grid[row, col], or with arrays of rows and
+    columns for vectorized code. The chunks are slabs of one backing array, so a vectorized read
+    is a single lookup of the slab index of every cell followed by one fancy index.
+
+    A grid can also be given a generator, which fills in a chunk the first time one of its cells
+    is looked up (see GeneratedChunks). Vectorized reads don't generate, they see chunks that
+    weren't generated yet as the fill.
+"""
+
+
+class ChunkedGrid:
+    def __init__(self, fill=0, dtype=object, generator=None):
+        self.fill = fill
+        self.dtype = np.dtype(dtype)
+        self.size = c.chunk_size
+        self.shift = self.size.bit_length() - 1
+        self.mask = self.size - 1
+
+        self.store = np.full((0, self.size, self.size), fill, dtype=self.dtype)
+        self.chunks = {} if generator is None else GeneratedChunks(self, generator)  # chunk coordinate -> its slab of the store
+        self.keys = np.zeros(0, dtype=np.int64)  # packed chunk coordinates, sorted
+        self.slabs = np.zeros(0, dtype=np.int64)  # slab index of each of self.keys
+
+    def __getitem__(self, key):
+        if type(key) is not tuple:
+            return GridRow(self, key)
+
+        row, col = key
+        if isinstance(row, (int, np.integer)) and isinstance(col, (int, np.integer)):
+            chunk = self.chunks.get((row >> self.shift, col >> self.shift))
+            if chunk is None:
+                return self.fill
+            return chunk[row & self.mask, col & self.mask]
+        return self.take(*self.expand(row, col))
+
+    def __setitem__(self, key, value):
+        row, col = key
+        if isinstance(row, (int, np.integer)) and isinstance(col, (int, np.integer)):
+            self.set(row, col, value)
+        else:
+            self.put(*self.expand(row, col), value)
+
+    def get(self, row, col):
+        chunk = self.chunks.get((row >> self.shift, col >> self.shift))
+        if chunk is None:
+            return self.fill
+        return chunk[row & self.mask, col & self.mask]
+
+    def set(self, row, col, value):
+        key = (row >> self.shift, col >> self.shift)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            if self.is_fill(value):
+                return
+            chunk = self.chunk(*key)
+        chunk[row & self.mask, col & self.mask] = value
+
+    def is_fill(self, value):
+        # objects in object grids are compared by identity, as they may define their own ==
+        return value is self.fill if self.dtype == object else value == self.fill
+
+    def chunk(self, chunk_row, chunk_col):
+        """ Return the chunk at a chunk coordinate, allocating it on first use. """
+        key = (int(chunk_row), int(chunk_col))
+        if key in self.chunks:
+            return self.chunks[key]
+
+        slab = len(self.chunks)
+        if slab == len(self.store):
+            self.grow()
+
+        self.chunks[key] = self.store[slab]
+        packed = self.pack(*key)
+        at = np.searchsorted(self.keys, packed)
+        self.keys = np.insert(self.keys, at, packed)
+        self.slabs = np.insert(self.slabs, at, slab)
+        return self.chunks[key]
+
+    def set_chunk(self, chunk_row, chunk_col, cells):
+        """ Set every cell of a chunk, allocating it without running the generator, as when loading a save. """
+        key = (int(chunk_row), int(chunk_col))
+        if isinstance(self.chunks, GeneratedChunks):
+            # the cells given stand in for what the generator would make
+            self.chunks.generated.add(key)
+        self.chunk(*key)[:] = cells
+
+    def grow(self):
+        store = np.full((max(4, 2 * len(self.store)), self.size, self.size), self.fill, dtype=self.dtype)
+        store[:len(self.store)] = self.store
+        self.store = store
+        for slab, key in enumerate(self.chunks):
+            self.chunks[key] = store[slab]
+
+    def pack(self, chunk_rows, chunk_cols):
+        return (np.int64(chunk_rows) << 32) + (np.int64(chunk_cols) + (1 << 31))
+
+    def slab_of(self, rows, cols):
+        """ Slab index of the chunk holding each cell, -1 where the chunk was never allocated. """
+        if len(self.keys) == 0:
+            return np.full(len(rows), -1, dtype=np.int64)
+
+        packed = self.pack(rows >> self.shift, cols >> self.shift)
+        at = np.minimum(np.searchsorted(self.keys, packed), len(self.keys) - 1)
+        slabs = self.slabs[at]
+        slabs[self.keys[at] != packed] = -1
+        return slabs
+
+    def take(self, rows, cols):
+        """ Vectorized read of the cells at matching rows and cols. """
+        shape = np.shape(rows)
+        rows, cols = np.ravel(rows).astype(np.int64), np.ravel(cols).astype(np.int64)
+        slabs = self.slab_of(rows, cols)
+        found = slabs >= 0
+        if found.all():
+            return self.store[slabs, rows & self.mask, cols & self.mask].reshape(shape)
+
+        values = np.full(len(rows), self.fill, dtype=self.dtype)
+        values[found] = self.store[slabs[found], rows[found] & self.mask, cols[found] & self.mask]
+        return values.reshape(shape)
+
+    def put(self, rows, cols, values):
+        """ Vectorized write of values (or a single value) to the cells at matching rows and cols. """
+        rows, cols = np.ravel(rows).astype(np.int64), np.ravel(cols).astype(np.int64)
+        values = np.ravel(np.broadcast_to(np.asarray(values, dtype=self.dtype), np.shape(rows)))
+        slabs = self.slab_of(rows, cols)
+
+        missing = slabs < 0
+        if missing.any():
+            for key in set(zip((rows[missing] >> self.shift).tolist(), (cols[missing] >> self.shift).tolist())):
+                self.chunk(*key)
+            slabs = self.slab_of(rows, cols)
+
+        self.store[slabs, rows & self.mask, cols & self.mask] = values
+
+    def chunk_of(self, row, col):
+        return (row >> self.shift, col >> self.shift)
+
+    def occupied(self, first_row, last_row, first_col, last_col):
+        """ Yield (row, col, value) for every cell in the block (end exclusive) not holding the fill. """
+        for chunk_row in range(first_row >> self.shift, ((last_row - 1) >> self.shift) + 1):
+            for chunk_col in range(first_col >> self.shift, ((last_col - 1) >> self.shift) + 1):
+                chunk = self.chunks.get((chunk_row, chunk_col))
+                if chunk is None:
+                    continue
+
+                top, left = chunk_row * self.size, chunk_col * self.size
+                row0, col0 = max(first_row - top, 0), max(first_col - left, 0)
+                block = chunk[row0:min(last_row - top, self.size), col0:min(last_col - left, self.size)]
+                # objects (structures, items) are always truthy, so a 0 / None fill can use the fast test
+                occupied = block.astype(bool) if self.dtype == object else block != self.fill
+                for row, col in zip(*occupied.nonzero()):
+                    yield top + row0 + int(row), left + col0 + int(col), block[row, col]
+
+    def expand(self, row, col):
+        """ Turn slices into index arrays, so grid[r0:r1, c0:c1] covers a rectangle. """
+        if isinstance(row, slice) or isinstance(col, slice):
+            row = np.arange(row.start, row.stop, row.step or 1) if isinstance(row, slice) else np.atleast_1d(row)
+            col = np.arange(col.start, col.stop, col.step or 1) if isinstance(col, slice) else np.atleast_1d(col)
+            return np.meshgrid(row, col, indexing="ij")
+        return np.asarray(row), np.asarray(col)
+
+
+class MappedChunkedGrid(ChunkedGrid):
+    """
+        A ChunkedGrid whose chunks are kept in a file mapped into memory instead of in RAM. Opening
+        one only reads the small index of which chunk is where, a chunk is paged in by the OS when
+        a cell of it is first read, and pages that are not used can be dropped again, so memory
+        tracks the part of the grid in use rather than its size. flush() makes the file current.
+    """
+
+    def __init__(self, file_path, fill=0, dtype=np.int64, reset=False, generator=None):
+        super().__init__(fill, dtype)
+        self.file_path = file_path
+        self.index_path = file_path + ".index.npy"
+        self.slab_bytes = self.size * self.size * self.dtype.itemsize
+
+        keys = np.zeros((0, 2), dtype=np.int64)
+        if reset or not os.path.exists(file_path):
+            # a new file rather than a truncated one, as grids still mapping the old one may be around
+            for old in [file_path, self.index_path]:
+                if os.path.exists(old):
+                    os.remove(old)
+            open(file_path, "wb").close()
+        elif os.path.exists(self.index_path):
+            keys = np.load(self.index_path)
+
+        self.map(os.path.getsize(file_path) // self.slab_bytes)
+        packed = self.pack(keys[:, 0], keys[:, 1])
+        self.slabs = np.argsort(packed)
+        self.keys = packed[self.slabs]
+        self.chunks = ChunkViews(self, generator)
+
+    def map(self, capacity):
+        if capacity == 0:
+            # an empty file can't be mapped
+            self.store = np.zeros((0, self.size, self.size), dtype=self.dtype)
+        else:
+            self.store = np.memmap(self.file_path, self.dtype, "r+", shape=(capacity, self.size, self.size))
+
+    def grow(self):
+        capacity = max(4, 2 * len(self.store))
+        self.flush_store()
+        with open(self.file_path, "r+b") as file:
+            file.truncate(capacity * self.slab_bytes)
+
+        self.map(capacity)
+        # the views are of the old mapping
+        dict.clear(self.chunks)
+
+    def chunk(self, chunk_row, chunk_col):
+        key = (int(chunk_row), int(chunk_col))
+        if key in self.chunks:
+            return self.chunks[key]
+
+        chunk = super().chunk(*key)
+        # the file grows with zeros, not with the fill
+        if not self.is_fill(0):
+            chunk[:] = self.fill
+        return chunk
+
+    def view(self, key):
+        """ The chunk at a chunk coordinate, None if it was never allocated. """
+        packed = self.pack(*key)
+        at = np.searchsorted(self.keys, packed)
+        if at == len(self.keys) or self.keys[at] != packed:
+            return None
+        return self.store[self.slabs[at]]
+
+    def allocated(self):
+        """ The chunk coordinates of the allocated chunks, in the order of their slabs. """
+        packed = np.empty(len(self.keys), dtype=np.int64)
+        packed[self.slabs] = self.keys
+        return np.stack([packed >> 32, (packed & 0xFFFFFFFF) - (1 << 31)], axis=1)
+
+    def flush_store(self):
+        if isinstance(self.store, np.memmap):
+            self.store.flush()
+
+    def flush(self):
+        """ Write the changed chunks and the index of the chunks to the file. """
+        self.flush_store()
+        temporary = self.file_path + ".index.tmp.npy"
+        np.save(temporary, self.allocated())
+        os.replace(temporary, self.index_path)
+
+
+class GeneratedChunks(dict):
+    """
+        The chunks of a ChunkedGrid with a generator, by chunk coordinate. Looking up a chunk that
+        isn't allocated calls generator(chunk_row, chunk_col) once for that coordinate, which
+        returns the chunk's cells, or None to leave it as the fill, so only the chunks something
+        actually reads are ever generated. A generator has to give the same chunk every time for
+        the same coordinate, as chunks left as the fill are generated again in later sessions.
+    """
+
+    def __init__(self, grid, generator):
+        super().__init__()
+        self.grid = grid
+        self.generator = generator
+        self.generated = set()
+
+    def get(self, key, default=None):
+        chunk = dict.get(self, key)
+        if chunk is None:
+            chunk = self.generate(key)
+            if chunk is None:
+                return default
+        return chunk
+
+    def generate(self, key):
+        if self.generator is None or key in self.generated:
+            return None
+
+        # marked first, allocating the chunk below looks it up again
+        self.generated.add(key)
+        cells = self.generator(*key)
+        if cells is None:
+            return None
+        chunk = self.grid.chunk(*key)
+        chunk[:] = cells
+        return chunk
+
+    def __getitem__(self, key):
+        chunk = self.get(key)
+        if chunk is None:
+            raise KeyError(key)
+        return chunk
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+
+class ChunkViews(GeneratedChunks):
+    """
+        The chunks of a MappedChunkedGrid by chunk coordinate, as grid.chunks is for a ChunkedGrid.
+        Only the chunks that were looked up are held as views, the rest are found in the grid's
+        sorted index when first needed, so opening a huge grid doesn't make a view of every chunk.
+    """
+
+    def get(self, key, default=None):
+        chunk = dict.get(self, key)
+        if chunk is None:
+            chunk = self.grid.view(key)
+            if chunk is None:
+                chunk = self.generate(key)
+                if chunk is None:
+                    return default
+            dict.__setitem__(self, key, chunk)
+        return chunk
+
+    def __len__(self):
+        return len(self.grid.keys)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        return iter(map(tuple, self.grid.allocated().tolist()))
+
+    def keys(self):
+        return list(self)
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+
+class GridRow:
+    """ One row of a ChunkedGrid, so grid[row][col] keeps working like the old lists of lists. """
+    __slots__ = ("grid", "row")
+
+    def __init__(self, grid, row):
+        self.grid = grid
+        self.row = row
+
+    def __getitem__(self, col):
+        grid = self.grid
+        chunk = grid.chunks.get((self.row >> grid.shift, col >> grid.shift))
+        if chunk is None:
+            return grid.fill
+        return chunk[self.row & grid.mask, col & grid.mask]
+
+    def __setitem__(self, col, value):
+        self.grid.set(self.row, col, value)
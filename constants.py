@@ -12,7 +12,8 @@ class Constants:
         self.frame = 0
         self.dt = 1.0 / self.fps
 
-        self.num_cells = 100
+        self.num_cells = 100  # extent of the map the camera can explore, the grids themselves are unbounded
+        self.chunk_size = 32  # cells per side of a grid chunk, must be a power of two
         self.cell_length = 35
 
         self.player_x = 0
@@ -23,6 +24,12 @@ class Constants:
         self.rot_state = 0
         self.ug_state = 3
         self.buffer_size = 4
+        self.autosave_interval = 120  # seconds between autosaves
+
+        # directory of a world whose ore and structure layers are memory-mapped files instead of arrays in RAM
+        self.world_dir = None
+        # seed the ore fields of a new world are generated from
+        self.world_seed = 0
 
         self.music_padding = 5
         self.ui_icon_size = 30
@@ -52,7 +59,7 @@ class Constants:
 
     def set_speeds(self):
         self.player_speed = 200
-        self.conveyor_speed = self.cell_length
+        self.conveyor_speed = 1  # cells per second
         self.arm_speed = 90 * 3.14 / 180
 
         self.mine_time = 2
@@ -0,0 +1,80 @@
+import os
+from functools import wraps
+from inspect import signature
+from typing import Any, Union, get_args, get_origin, get_type_hints
+import numpy as np
+
+"""
+    Type contracts for the simulation code. With PYFACTORY_CONTRACTS=1 in the environment (while
+    developing or testing), @typechecked checks the annotated arguments and return value of every
+    call and raises a TypeError on a mismatch. Otherwise it hands back the undecorated function, so
+    the game pays nothing for it. The mode is read once, when this module is first imported.
+"""
+
+ENABLED = os.environ.get("PYFACTORY_CONTRACTS", "0") not in ["", "0"]
+
+
+def typechecked(function):
+    if not ENABLED:
+        return function
+
+    parameters = signature(function)
+    hints = {}  # resolved on the first call, once the classes named in forward references exist
+
+    @wraps(function)
+    def checked(*args, **kwargs):
+        if not hints:
+            hints.update(get_type_hints(function))
+            hints.setdefault("return", Any)
+
+        for name, value in parameters.bind(*args, **kwargs).arguments.items():
+            if name in hints and not matches(value, hints[name]):
+                raise TypeError(f"{function.__qualname__}() got {value!r} for {name}, expected {describe(hints[name])}")
+
+        result = function(*args, **kwargs)
+        if not matches(result, hints["return"]):
+            raise TypeError(f"{function.__qualname__}() returned {result!r}, expected {describe(hints['return'])}")
+        return result
+
+    return checked
+
+
+def matches(value, hint):
+    """ Whether value satisfies the type hint. Hints this doesn't understand are taken as satisfied. """
+    if hint is Any or hint is object:
+        return True
+    if hint is None or hint is type(None):
+        return value is None
+    if hint is float:
+        # an int is acceptable where a float is expected
+        return isinstance(value, (int, float, np.integer, np.floating))
+    if hint is int:
+        return isinstance(value, (int, np.integer))
+    if hint is bool:
+        # comparisons against cells of the NumPy backed grids give NumPy booleans
+        return isinstance(value, (bool, np.bool_))
+
+    origin, args = get_origin(hint), get_args(hint)
+    if origin is Union:
+        return any(matches(value, arg) for arg in args)
+    if origin is list:
+        return isinstance(value, list) and (not args or all(matches(element, args[0]) for element in value))
+    if origin is tuple:
+        if not isinstance(value, tuple):
+            return False
+        if not args:
+            return True
+        if len(args) == 2 and args[1] is Ellipsis:
+            return all(matches(element, args[0]) for element in value)
+        return len(value) == len(args) and all(matches(element, arg) for element, arg in zip(value, args))
+    if origin is dict:
+        return isinstance(value, dict) and (not args or all(matches(k, args[0]) and matches(v, args[1]) for k, v in value.items()))
+    if origin is not None:
+        return isinstance(value, origin)
+    if isinstance(hint, type):
+        return isinstance(value, hint)
+    return True
+
+
+def describe(hint):
+    return hint.__name__ if isinstance(hint, type) else str(hint).replace("typing.", "")
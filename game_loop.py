@@ -1,32 +1,75 @@
+from os import path
 from time import time
 import pygame as pg
 
+from autosave import AUTOSAVE, autosave
+import blueprint
+from background import background
 from constants import consts as c
+from history import history
 from id_mapping import id_map
 from images import img as i
 from items import item_manager as im
 from music_player import music_player as mp
-from structures.structure import structure_manager as sm
+from profiler import profiler
+import save
+from simulation import simulation
+from structures.structure import line_cells, rect_cells, structure_manager as sm
+import tracing
+from tracing import tracer
 from ui.game_ui import ui
 from utils import *
 from world import world as w
 
 
 def game_loop():
+    # with PYFACTORY_TRACE the phases of the most recent frames are recorded from the start, so a slow frame can be looked at afterwards
+    tracer.enabled = tracing.ENABLED
+    history.enabled = True
+    replayed = autosave.begin()
+    if replayed is not None:
+        ui.show(f"Recovered the last game from {AUTOSAVE} and {replayed} journaled operations")
+
+    try:
+        run_frames()
+        autosave.end()
+    finally:
+        autosave.wait()
+        if tracer.enabled:
+            tracer.dump()
+
+
+def run_frames():
     title = c.orbitron.render("PyFactory", True, pg.Color("white"))
+    drag_from = None  # cell under the cursor the frame before, while conveyors are being dragged
+    rect_from = None  # cell where the left button went down, for placing a rectangle of structures
+    copy_from = None  # first corner of the section being copied
+    copied = None     # blueprint V stamps
 
     while True:
+        profiler.begin_frame()
         start = time()
         c.clock.tick(c.fps)
+        profiler.lap("idle")
 
         keys_pressed = pg.key.get_pressed()
         move_player(keys_pressed)
         cell_row, cell_col, cell_x, cell_y = get_pointer_params()
 
+        left, _, right = pg.mouse.get_pressed()
+        if not left and not right:
+            # whatever was built since the mouse went down is undone as one
+            history.commit()
+
         if c.const_state == 1:
-            left, _, right = pg.mouse.get_pressed()
             if left:
-                sm.add(cell_row, cell_col, id_map["conveyor"], c.rot_state)
+                # lay the whole line the cursor crossed since the last frame, so fast drags leave no gaps
+                if drag_from is None:
+                    drag_from = (cell_row, cell_col)
+                sm.add_many(line_cells(*drag_from, cell_row, cell_col), id_map["conveyor"], c.rot_state)
+                drag_from = (cell_row, cell_col)
+            else:
+                drag_from = None
             if right:
                 sm.remove(cell_row, cell_col)
 
@@ -42,6 +85,37 @@ def game_loop():
                     ui.update_selection
                 if event.key == pg.K_g:
                     c.toggle_gridlines()
+                if event.key == pg.K_F2:
+                    tracer.toggle_structures()
+                if event.key == pg.K_F3:
+                    profiler.toggle()
+                if event.key == pg.K_F4:
+                    trace = tracer.toggle()
+                    ui.show("Recording a trace" if trace is None else f"Trace written to {trace}")
+                if event.key == pg.K_F5:
+                    ui.show(f"Game saved to {save.save()}")
+                if event.key == pg.K_F9:
+                    if path.exists(save.QUICKSAVE):
+                        save.load()
+                        history.clear()
+                        # the journal has to continue from the loaded game
+                        autosave.start()
+                        ui.show(f"Game loaded from {save.QUICKSAVE}")
+                    else:
+                        ui.show(f"No save to load at {save.QUICKSAVE}")
+                if event.key == pg.K_c:
+                    if copy_from is None:
+                        copy_from = (cell_row, cell_col)
+                    else:
+                        copied = blueprint.capture(sm, *copy_from, cell_row, cell_col)
+                        copy_from = None
+                        ui.show(f"Copied {len(copied)} structures")
+                if event.key == pg.K_v and copied is not None:
+                    blueprint.stamp(sm, copied, cell_row, cell_col)
+                if event.key == pg.K_z:
+                    history.undo(sm)
+                if event.key == pg.K_y:
+                    history.redo(sm)
                 if event.key == pg.K_r or event.key == pg.K_l:
                     rotation = 1 if event.key == pg.K_r else -1
                     if sm.grid[cell_row][cell_col] != 0:
@@ -59,18 +133,23 @@ def game_loop():
                         c.cell_length -= 5
 
                     i.reload_images()
-                    sm.apply_zoom()
-                    im.apply_zoom()
 
             if event.type == pg.MOUSEBUTTONDOWN:
                 if event.button == 1:
                     sm.add(cell_row, cell_col, c.const_state - 1, c.rot_state)
+                    rect_from = (cell_row, cell_col)
                 if event.button == 3:
                     if im.grid[cell_row][cell_col] != 0:
                         im.remove(cell_row, cell_col, True)
                     elif sm.grid[cell_row][cell_col] != 0:
                         sm.remove(cell_row, cell_col)
 
+            if event.type == pg.MOUSEBUTTONUP and event.button == 1:
+                # dragging with any other structure fills the rectangle spanned
+                if rect_from is not None and rect_from != (cell_row, cell_col) and c.const_state != 1:
+                    sm.add_many(rect_cells(*rect_from, cell_row, cell_col), c.const_state - 1, c.rot_state)
+                rect_from = None
+
             if event.type == pg.MOUSEWHEEL:
                 if event.y > 0:
                     c.cell_length += 2
@@ -78,21 +157,26 @@ def game_loop():
                     c.cell_length -= 2
 
                 i.reload_images()
-                sm.apply_zoom()
-                im.apply_zoom()
+
+        profiler.lap("events")
 
         c.screen.fill(c.bg_color)
-        if c.show_gridlines:
-            draw_gridlines()
+        profiler.lap("clear")
 
-        sm.update()
-        im.update(sm)
+        simulation.update()
+        autosave.update()
         mp.check_next_music()
+        profiler.lap("other")
 
-        w.render()
+        # the world is drawn from the cached background chunks
+        background.render(sm, w)
+        profiler.lap("w.render")
         sm.render()
+        profiler.lap("sm.render")
         im.render()
+        profiler.lap("im.render")
         ui.render()
+        profiler.lap("ui.render")
 
         if sm.grid[cell_row][cell_col] == 0:
             draw_action(cell_x, cell_y)
@@ -104,14 +188,21 @@ def game_loop():
 
         if w.grid[cell_row][cell_col] != 0:
             w.render_tooltip(cell_row, cell_col)
+        profiler.lap("tooltips")
 
         pg.draw.rect(c.screen, pg.Color("black"), (0, 0, c.sw, c.title_font_size * 2))
         c.screen.blit(title, ((c.sw - title.get_width()) / 2, c.title_font_size / 2))
 
         fps_text = c.merriweather.render(f"FPS: {round(c.clock.get_fps())}", True, pg.Color("white"))
         c.screen.blit(fps_text, (c.sw - fps_text.get_width() - 10, 10))
+        profiler.lap("other")
+
+        profiler.render()
+        profiler.lap("profiler")
 
         pg.display.flip()
+        profiler.lap("pg.display.flip")
+        profiler.end_frame()
 
         end = time()
         c.set_dt(end - start)
@@ -0,0 +1,34 @@
+import os
+
+# Importing this module before anything that touches pygame (constants, images, ...) selects
+# SDL's dummy video and audio drivers, so the factory can be simulated on a machine without
+# a display or a sound card. The game itself never imports it.
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+
+if __name__ == '__main__':
+    # this runs the simulation without opening a window
+    from argparse import ArgumentParser
+    from time import perf_counter
+
+    from constants import consts as c
+
+    parser = ArgumentParser(description="Advance the factory headless for a fixed number of ticks.")
+    parser.add_argument("--ticks", type=int, default=10000)
+    parser.add_argument("--dt", type=float, default=1.0 / c.fps)
+    parser.add_argument("--world", help="directory of a memory-mapped world")
+    parser.add_argument("--seed", type=int, default=c.world_seed, help="seed of the ore fields of a new world")
+    args = parser.parse_args()
+
+    # before anything imports the world
+    c.world_dir = args.world
+    c.world_seed = args.seed
+    from simulation import simulation
+
+    start = perf_counter()
+    simulation.step(args.ticks, args.dt)
+    elapsed = perf_counter() - start
+
+    print(f"{args.ticks} ticks in {elapsed:.3f}s ({args.ticks / elapsed:.0f} ticks/s)")
@@ -0,0 +1,160 @@
+from collections import deque
+import numpy as np
+
+from constants import consts as c
+from id_mapping import id_map
+from structures.scheduler import scheduler
+
+"""
+    Undo and redo of what the player builds. StructureManager and Factory record a small delta
+    for every structure added, removed or rotated and every recipe changed, holding what is needed
+    to apply the change in either direction rather than copies of the grids, add_many and
+    remove_many a run of them as one array, which undo and redo apply in bulk. Deltas collect until
+    the game loop commits them as one entry, which it does every frame the mouse isn't held, so a
+    drag of conveyors is undone in one go. The entries are kept in a ring buffer bounded both in
+    entries and in deltas, the oldest are dropped first.
+
+    Nothing is recorded until the game loop turns history on, so headless runs, the benchmarks
+    and scripts that build through StructureManager don't collect deltas nobody commits.
+"""
+
+MAX_ENTRIES = 500
+MAX_DELTAS = 100000
+
+ADD, REMOVE, ROTATE, SET_RECIPE = range(1, 5)
+
+DELTA = np.dtype([
+    ("op", "u1"),
+    ("row", "<i4"),
+    ("col", "<i4"),
+    ("type", "i1"),       # structure type for ADD and REMOVE
+    ("direction", "i1"),  # direction it is added with for ADD and REMOVE, rotation for ROTATE
+    ("length", "i1"),     # underground length for ADD and REMOVE
+    ("old", "<i2"),       # recipe before a SET_RECIPE or of a removed factory, -1 for none
+    ("new", "<i2"),       # recipe after a SET_RECIPE
+])
+
+
+class History:
+    def __init__(self):
+        self.enabled = False
+        self.clear()
+
+    def clear(self):
+        self.pending = []
+        self.undone = []
+        self.entries = deque()
+        self.deltas = 0
+        self.applying = False
+
+    def recording(self):
+        return self.enabled and not self.applying
+
+    def record(self, op, row, col, structure_type = -1, direction = 0, length = 0, old = -1, new = -1):
+        if self.recording():
+            self.pending.append((op, row, col, structure_type, direction, length, old, new))
+
+    def record_all(self, op, rows, cols, structure_types = -1, directions = 0, lengths = 0, old = -1):
+        """ record for many cells at once, kept as one array rather than a delta each. """
+        if self.recording() and len(rows):
+            deltas = np.zeros(len(rows), dtype=DELTA)
+            deltas["op"] = op
+            deltas["row"] = rows
+            deltas["col"] = cols
+            deltas["type"] = structure_types
+            deltas["direction"] = directions
+            deltas["length"] = lengths
+            deltas["old"] = old
+            deltas["new"] = -1
+            self.pending.append(deltas)
+
+    def commit(self):
+        """ Close the entry the deltas recorded since the last commit make up. """
+        if not self.pending:
+            return
+
+        # single deltas are tuples, runs from record_all arrays
+        parts, singles = [], []
+        for delta in self.pending:
+            if isinstance(delta, np.ndarray):
+                if singles:
+                    parts.append(np.array(singles, dtype=DELTA))
+                    singles = []
+                parts.append(delta)
+            else:
+                singles.append(delta)
+        if singles:
+            parts.append(np.array(singles, dtype=DELTA))
+
+        entry = np.concatenate(parts)
+        self.pending = []
+        self.undone = []
+        self.entries.append(entry)
+        self.deltas += len(entry)
+        while len(self.entries) > MAX_ENTRIES or self.deltas > MAX_DELTAS:
+            self.deltas -= len(self.entries.popleft())
+
+    def undo(self, sm):
+        """ Revert the last entry, returning whether there was one. """
+        self.commit()
+        if not self.entries:
+            return False
+
+        entry = self.entries.pop()
+        self.deltas -= len(entry)
+        self.apply(sm, entry[::-1], backwards=True)
+        self.undone.append(entry)
+        return True
+
+    def redo(self, sm):
+        """ Apply the last undone entry again, returning whether there was one. """
+        self.commit()
+        if not self.undone:
+            return False
+
+        entry = self.undone.pop()
+        self.apply(sm, entry, backwards=False)
+        self.entries.append(entry)
+        self.deltas += len(entry)
+        return True
+
+    def apply(self, sm, deltas, backwards):
+        self.applying = True
+        try:
+            with sm.batched():
+                # consecutive adds or removes, e.g. of a drag, are applied together
+                starts = np.flatnonzero(np.diff(deltas["op"], prepend=0))
+                for start, end in zip(starts.tolist(), starts[1:].tolist() + [len(deltas)]):
+                    run = deltas[start:end]
+                    op = int(run["op"][0])
+                    if op in (ROTATE, SET_RECIPE):
+                        self.apply_each(sm, run, backwards)
+                    elif (op == ADD) == backwards:
+                        sm.remove_many(np.stack([run["row"], run["col"]], axis=1), quiet=True)
+                    else:
+                        sm.add_many(np.stack([run["row"], run["col"]], axis=1), run["type"], run["direction"], run["length"], quiet=True)
+                        recipes = run[(run["type"] == id_map["factory"]) & (run["old"] >= 0)]
+                        for row, col, recipe in zip(*(recipes[name].tolist() for name in ["row", "col", "old"])):
+                            set_recipe(sm.grid[row][col], recipe)
+        finally:
+            self.applying = False
+
+    def apply_each(self, sm, deltas, backwards):
+        """ Apply rotations and recipe changes one by one. """
+        columns = [deltas[name].tolist() for name in ["op", "row", "col", "direction", "old", "new"]]
+        for op, row, col, direction, old, new in zip(*columns):
+            if op == ROTATE:
+                sm.rotate(row, col, -direction if backwards else direction, quiet=True)
+            else:
+                set_recipe(sm.grid[row][col], old if backwards else new)
+
+
+def set_recipe(factory, recipe):
+    if recipe < 0:
+        factory.clear_recipe()
+    else:
+        factory.set_recipe(recipe)
+    scheduler.wake(factory)
+
+
+history = History()
@@ -1,46 +1,80 @@
+from collections import OrderedDict
 from os import path
+from threading import Lock, Thread
 import pygame as pg
 
 from constants import consts as c
 from id_mapping import id_map
 from loader import get_resource_path
+from tracing import tracer
 
 
 class Images:
     def __init__(self):
-        self.images = []
+        # every PNG is decoded once, scaled (and rotated) sets are kept per zoom level
+        self.raw_images = {}
+        self.scaled_sets = OrderedDict()  # cell_length -> images list, least recently used first
+        self.max_sets = 16
+        self.lock = Lock()
+
+        self.images = self.get_scaled_set(c.cell_length)
+
+    def get_raw_image(self, image_name):
+        with self.lock:
+            if image_name not in self.raw_images:
+                image_path = path.join("sprites", image_name + ".png")
+                self.raw_images[image_name] = pg.image.load(get_resource_path(image_path))
+            return self.raw_images[image_name]
+
+    def get_scaled_set(self, cell_length):
+        with self.lock:
+            if cell_length in self.scaled_sets:
+                self.scaled_sets.move_to_end(cell_length)
+                return self.scaled_sets[cell_length]
+
+        images = self.build_scaled_set(cell_length)
+        self.store_scaled_set(cell_length, images)
+        return images
+
+    def store_scaled_set(self, cell_length, images):
+        with self.lock:
+            self.scaled_sets[cell_length] = images
+            self.scaled_sets.move_to_end(cell_length)
+            while len(self.scaled_sets) > self.max_sets:
+                self.scaled_sets.popitem(last=False)
+
+    def build_scaled_set(self, cell_length):
+        images = []
 
         for key, value in id_map.items():
             if value == 0:
-                self.images.append(Images.load_all_rotated_images(["conveyor"]))
+                images.append(self.load_all_rotated_images(["conveyor"], cell_length))
             elif value == 1:
-                self.images.append(Images.load_all_rotated_images(["conveyor_ug_source", "conveyor_ug_target"]))
+                images.append(self.load_all_rotated_images(["conveyor_ug_source", "conveyor_ug_target"], cell_length))
             elif value == 2:
-                self.images.append(Images.load_all_rotated_images(["splitter"]))
+                images.append(self.load_all_rotated_images(["splitter"], cell_length))
             else:
-                self.images.append(Images.load_scale_image(key))
+                images.append(self.load_scale_image(key, cell_length))
+
+        return images
 
-    @staticmethod
-    def load_all_rotated_images(image_names):
+    def load_all_rotated_images(self, image_names, cell_length):
         images_list = []
 
         for image_name in image_names:
+            raw_image = self.get_raw_image(image_name)
             for direction in range(4):
-                image_path = path.join("sprites", image_name + ".png")
-                raw_image = pg.image.load(get_resource_path(image_path))
                 rotated_image = pg.transform.rotate(raw_image, -direction * 90)
-                scaled_image = pg.transform.smoothscale(rotated_image, (c.cell_length, c.cell_length))
+                scaled_image = pg.transform.smoothscale(rotated_image, (cell_length, cell_length))
                 images_list.append(scaled_image)
-        
+
         return images_list
 
-    @staticmethod
-    def load_scale_image(image_name):
-        image_path = path.join("sprites", image_name + ".png")
-        raw_image = pg.image.load(get_resource_path(image_path))
-        scaled_image = pg.transform.smoothscale(raw_image, (c.cell_length, c.cell_length))
+    def load_scale_image(self, image_name, cell_length):
+        raw_image = self.get_raw_image(image_name)
+        scaled_image = pg.transform.smoothscale(raw_image, (cell_length, cell_length))
         return scaled_image
-    
+
     def convert_alpha(self):
         for i in range(1, len(self.images)):
             if type(self.images[i]) == list:
@@ -48,8 +82,24 @@ class Images:
                     self.images[i][j] = self.images[i][j].convert_alpha()
             else:
                 self.images[i] = self.images[i].convert_alpha()
-    
+
     def reload_images(self):
-        self.__init__()
+        with tracer.span("reload_images", "zoom"):
+            self.images = self.get_scaled_set(c.cell_length)
+        # the mouse wheel zooms in steps of 2 and the m / n keys in steps of 5
+        self.prewarm([c.cell_length + step for step in [-2, 2, -5, 5]])
+
+    def prewarm(self, cell_lengths):
+        """ Scale the sets for the given zoom levels on a background thread, so zooming to them doesn't stall. """
+        with self.lock:
+            missing = [cell_length for cell_length in cell_lengths if cell_length > 0 and cell_length not in self.scaled_sets]
+
+        if missing:
+            Thread(target=self.build_missing_sets, args=(missing,), daemon=True).start()
+
+    def build_missing_sets(self, cell_lengths):
+        for cell_length in cell_lengths:
+            with tracer.span(f"prewarm {cell_length}px", "zoom"):
+                self.store_scaled_set(cell_length, self.build_scaled_set(cell_length))
 
-img = Images()
\ No newline at end of file
+img = Images()
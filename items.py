@@ -1,11 +1,18 @@
-from pytypes import typechecked
+from math import floor
+from contracts import typechecked
+import numpy as np
 
 from typing import Optional
+from camera import camera
+from chunked_grid import ChunkedGrid
 from constants import consts as c
 from structures.conveyor import Conveyor, ConveyorUnderground
 from id_mapping import id_map, reverse_id_map
 from images import img as i
+from journal import REMOVE_ITEM, journal
+from structures.scheduler import scheduler
 from structures.splitter import Splitter
+from structures.transport_line import DIRECTION_NAMES, TransportLineManager, cell_of
 from ui.game_ui import ui
 
 #from structures.structure import StructureManager as sm
@@ -28,6 +35,7 @@ class Item:
         self.last_dir: Optional[str] = None
         self.caught: bool = False
         self.display: bool = True
+        self.line = None
 
     @typechecked
     def move(self, direction: str) -> None:
@@ -45,18 +53,20 @@ class Item:
 
         self.last_dir = direction
 
-        self.row = int(self.y / c.cell_length)
-        self.col = int(self.x / c.cell_length)
+        self.row = cell_of(self.y)
+        self.col = cell_of(self.x)
 
     @typechecked
     def calc_position(self) -> None:
-        self.x = self.col * c.cell_length + c.cell_length // 2
-        self.y = self.row * c.cell_length + c.cell_length // 2
+        # positions are in world units (cells), the camera scales them when rendering
+        self.x = self.col + 0.5
+        self.y = self.row + 0.5
 
     @typechecked
     def render(self) -> None:
         if self.display:
-            c.screen.blit(i.images[self.item], (self.x - c.player_x - c.cell_length // 2, self.y - c.player_y - c.cell_length // 2))
+            x, y = camera.to_screen(self.x, self.y)
+            c.screen.blit(i.images[self.item], (x - c.cell_length // 2, y - c.cell_length // 2))
 
     @typechecked
     def render_tooltip(self) -> None:
@@ -65,13 +75,15 @@ class Item:
 
 class ItemManager:
     def __init__(self) -> None:
-        self.grid = []
-        for _ in range(c.num_cells):
-            new_row = [0 for _ in range(c.num_cells)]
-            self.grid.append(new_row)
+        self.grid = ChunkedGrid()
         self.items = []
+        self.caught = {}  # items held by arms, which are in no grid cell
+        self.lines = TransportLineManager()
 
     def update(self, sm) -> None:
+        self.lines.update(sm, self)
+
+        adopted = []
         for item in self.items:
             old_row, old_col = item.row, item.col
 
@@ -98,20 +110,53 @@ class ItemManager:
                 if old_row != new_row or old_col != new_col:
                     self.grid[old_row][old_col] = 0
                     self.grid[new_row][new_col] = item
+                    scheduler.notify(old_row, old_col)
+                    scheduler.notify(new_row, new_col)
+
+                    line = self.lines.line_at(new_row, new_col)
+                    if line is not None:
+                        line.insert(item, self)
+                        adopted.append(item)
+
+        for item in adopted:
+            self.items.remove(item)
 
     def render(self):
-        for item in self.items:
-            item.render()
+        # items are found through the grid cells on screen, lines draw all their items at once
+        lines = {}
+        for _, _, item in self.grid.occupied(*camera.visible_cells()):
+            if item.line is None:
+                item.render()
+            else:
+                lines[item.line] = None
+
+        for item in self.caught:
+            row, col = floor(item.y), floor(item.x)
+            if camera.is_visible(row, row + 1, col, col + 1):
+                item.render()
+
+        for line in lines:
+            line.render()
 
     def add(self, row, col, item):
         new_item = Item(row, col, item)
         self.grid[row][col] = new_item
-        self.items.append(new_item)
+        scheduler.notify(row, col)
+
+        line = self.lines.line_at(row, col)
+        if line is not None:
+            line.insert(new_item, self)
+        else:
+            self.items.append(new_item)
 
     def remove(self, row, col, by_player = False):
         if self.grid[row][col] != 0:
             item = self.grid[row][col]
             self.grid[row][col] = 0
+            scheduler.notify(row, col)
+
+            if item.line is not None:
+                item.line.discard(item)
 
             try:
                 self.items.remove(item)
@@ -120,20 +165,45 @@ class ItemManager:
 
             if by_player:
                 c.item_pick_up.play()
+                journal.record(REMOVE_ITEM, row, col)
 
     def fetch_item(self, row, col):
         if self.grid[row][col] != 0:
             item_to_be_fetched = self.grid[row][col]
             self.grid[row][col] = 0
+            scheduler.notify(row, col)
+
+            if item_to_be_fetched.line is not None:
+                item_to_be_fetched.line.discard(item_to_be_fetched)
+                self.items.append(item_to_be_fetched)
+            item_to_be_fetched.caught = True
+            self.caught[item_to_be_fetched] = None
             return item_to_be_fetched
         
     def drop_item(self, item, x, y):
-        row = int(y / c.cell_length)
-        col = int(x / c.cell_length)
+        row = floor(y)
+        col = floor(x)
         self.grid[row][col] = item
+        scheduler.notify(row, col)
         
         item.row = row
         item.col = col
+        item.caught = False
+        self.caught.pop(item, None)
+
+        line = self.lines.line_at(row, col)
+        if line is not None:
+            self.items.remove(item)
+            line.insert(item, self)
+
+    def free(self, item):
+        """ Hand an item a transport line let go of back to the per-item update. """
+        self.items.append(item)
+
+    def adopted(self, items):
+        """ Take items transport lines took over out of the per-item update. """
+        adopted = set(map(id, items))
+        self.items = [item for item in self.items if id(item) not in adopted]
 
     def contains_ore(self, row, col):
         if self.grid[row][col] != 0 and self.grid[row][col].item in [id_map["iron_ore"], id_map["copper_ore"]]:
@@ -141,13 +211,63 @@ class ItemManager:
         else:
             return False
         
-    def apply_zoom(self):
-        for item in self.items:
-            item.calc_position()
+    def structure_changed(self, sm, cells):
+        self.lines.rebuild_around(sm, self, cells)
 
     def garbage_collection(self):
         for item in self.items:
             if not item.caught and self.grid[item.row][item.col] == 0:
                 self.items.remove(item)
 
+    def handle_of(self, item):
+        """ What snapshot() lists an item as. """
+        return id(item)
+
+    def snapshot(self):
+        """ Columns of every free, held and belt item and of the transport lines, with the items' handles in row order. """
+        items = list(self.items)
+        for line in self.lines.lines:
+            items.extend(line.items)
+
+        arrays = {
+            "items.engine": np.array(0),  # 1 in saves of the NumPy item engine, which has been removed
+            "items.free": np.array(len(self.items)),
+            "items.kind": np.array([item.item for item in items], dtype=np.int16),
+            "items.row": np.array([item.row for item in items], dtype=np.int32),
+            "items.col": np.array([item.col for item in items], dtype=np.int32),
+            "items.x": np.array([item.x for item in items], dtype=np.float64),
+            "items.y": np.array([item.y for item in items], dtype=np.float64),
+            "items.last_dir": np.array([-1 if item.last_dir is None else DIRECTION_NAMES.index(item.last_dir) for item in items], dtype=np.int8),
+            "items.caught": np.array([item.caught for item in items], dtype=bool),
+            "items.display": np.array([item.display for item in items], dtype=bool),
+            "items.in_grid": np.array([self.grid[item.row][item.col] is item for item in items], dtype=bool),
+        }
+        arrays.update(self.lines.snapshot(len(self.items)))
+        return arrays, [id(item) for item in items]
+
+    def restore(self, arrays, sm):
+        """ Replace every item with the ones in a snapshot, returning them in row order. """
+        if int(arrays["items.engine"]) != 0:
+            raise ValueError("the save was made with the vectorized item engine")
+
+        self.grid = ChunkedGrid()
+        self.caught = {}
+        items = []
+        columns = [arrays[f"items.{name}"].tolist() for name in ["kind", "row", "col", "x", "y", "last_dir", "caught", "display", "in_grid"]]
+        for kind, row, col, x, y, last_dir, caught, display, in_grid in zip(*columns):
+            item = Item(row, col, kind)
+            item.x, item.y = x, y
+            item.last_dir = None if last_dir < 0 else DIRECTION_NAMES[last_dir]
+            item.caught, item.display = caught, display
+            if in_grid:
+                self.grid[row][col] = item
+            if caught:
+                self.caught[item] = None
+            items.append(item)
+
+        self.items = items[:int(arrays["items.free"])]
+        self.lines.rebuild(sm)
+        self.lines.restore(arrays, items)
+        return items
+
 item_manager = ItemManager()
\ No newline at end of file
@@ -0,0 +1,74 @@
+import numpy as np
+
+from structures.production.event_calendar import calendar
+
+"""
+    Append-only journal of what the player changes: structures added, removed and rotated,
+    recipes set and items picked up. Each operation is one fixed-size binary record appended to
+    the open journal file and flushed straight away, so a crash loses at most the operation being
+    written. A journal continues from a checkpoint (the autosave) and is deleted once a later
+    checkpoint covers it, see autosave.py.
+"""
+
+ADD, REMOVE, ROTATE, SET_RECIPE, REMOVE_ITEM = range(1, 6)
+
+RECORD = np.dtype([
+    ("time", "<f8"),       # simulation time the operation happened at
+    ("op", "u1"),
+    ("row", "<i4"),
+    ("col", "<i4"),
+    ("value", "<i2"),      # structure type for ADD, recipe (-1 for none) for SET_RECIPE
+    ("direction", "i1"),   # direction for ADD, rotation for ROTATE
+    ("length", "i1"),      # underground length for ADD
+])
+
+
+class Journal:
+    def __init__(self):
+        self.file = None
+        self.file_path = None
+
+    def open(self, file_path):
+        """ Start recording into a new journal file, closing the previous one. """
+        self.close()
+        self.file = open(file_path, "wb")
+        self.file_path = file_path
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            self.file_path = None
+
+    def record(self, op, row, col, value = -1, direction = 0, length = 0):
+        if self.file is None:
+            return
+
+        record = np.array([(calendar.time, op, row, col, value, direction, length)], dtype=RECORD)
+        self.file.write(record.tobytes())
+        self.file.flush()
+
+    def record_all(self, op, rows, cols, value = -1, direction = 0, length = 0):
+        """ record for many cells at once, written and flushed together. """
+        if self.file is None or len(rows) == 0:
+            return
+
+        records = np.zeros(len(rows), dtype=RECORD)
+        records["time"] = calendar.time
+        records["op"] = op
+        records["row"] = rows
+        records["col"] = cols
+        records["value"] = value
+        records["direction"] = direction
+        records["length"] = length
+        self.file.write(records.tobytes())
+        self.file.flush()
+
+    def read(self, file_path):
+        """ The records of a journal file, leaving out a last one that was cut short. """
+        with open(file_path, "rb") as file:
+            data = file.read()
+        return np.frombuffer(data[:len(data) - len(data) % RECORD.itemsize], dtype=RECORD)
+
+
+journal = Journal()
@@ -1,6 +1,14 @@
+import sys
 import pygame as pg
 
 from constants import consts as c
+
+# a memory-mapped world and the seed have to be chosen before game_loop imports the world
+if "--world" in sys.argv[1:]:
+    c.world_dir = sys.argv[sys.argv.index("--world") + 1]
+if "--seed" in sys.argv[1:]:
+    c.world_seed = int(sys.argv[sys.argv.index("--seed") + 1])
+
 from game_loop import game_loop
 
 
@@ -0,0 +1,142 @@
+from collections import deque
+from time import perf_counter
+import pygame as pg
+
+from constants import consts as c
+from loader import get_resource_path
+from tracing import tracer
+
+"""
+    Live frame profiler, toggled with F3. The game loop calls lap(phase) at the end of each phase
+    of the frame, charging the time since the previous lap to that phase, and StructureManager
+    charges every structure update to the structure's class. The overlay shows averages and peaks
+    over the last HISTORY frames and a histogram of frame times. The laps are also the spans the
+    tracer records. While neither is on, a lap only checks two flags.
+"""
+
+HISTORY = 240  # frames the overlay summarises
+REFRESH = 15   # frames between redraws of the overlay text
+HISTOGRAM_BOUNDS = [4, 8, 12, 17, 25, 33, 50, 100]  # upper bounds of the frame time bins in ms, the last bin is open
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.history = deque(maxlen=HISTORY)  # (frame ms, {phase: ms}, {structure class: (ms, updates)}) per frame
+
+        self.font = pg.font.Font(get_resource_path("fonts/Merriweather-Regular.ttf"), 14)
+        self.panel = None
+        self.frames_since_refresh = 0
+
+        self.begin_frame()
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.history.clear()
+        self.panel = None
+        self.begin_frame()
+
+    def begin_frame(self):
+        self.frame_start = self.last = perf_counter()
+        self.phases = {}
+        self.structures = {}
+
+    def lap(self, phase):
+        if self.enabled or tracer.enabled:
+            now = perf_counter()
+            if self.enabled:
+                self.phases[phase] = self.phases.get(phase, 0.0) + 1000 * (now - self.last)
+            if tracer.enabled:
+                tracer.record(phase, "phase", self.last, now)
+            self.last = now
+
+    def add_structure_time(self, name, seconds):
+        ms, updates = self.structures.get(name, (0.0, 0))
+        self.structures[name] = (ms + 1000 * seconds, updates + 1)
+
+    def end_frame(self):
+        if self.enabled or tracer.enabled:
+            now = perf_counter()
+            if self.enabled:
+                self.history.append((1000 * (now - self.frame_start), self.phases, self.structures))
+                self.frames_since_refresh += 1
+            if tracer.enabled:
+                tracer.record("frame", "frame", self.frame_start, now)
+
+    def render(self):
+        if not self.enabled or not self.history:
+            return
+
+        if self.panel is None or self.frames_since_refresh >= REFRESH:
+            self.panel = self.draw_panel()
+            self.frames_since_refresh = 0
+        # top right, clear of the tooltip text in the top left
+        c.screen.blit(self.panel, (c.sw - self.panel.get_width() - 10, 2 * c.title_font_size + 10))
+
+    def draw_panel(self):
+        frames = len(self.history)
+        frame_times = [frame_ms for frame_ms, _, _ in self.history]
+        frame_avg = sum(frame_times) / frames
+
+        phase_totals, phase_peaks = {}, {}
+        structure_totals = {}
+        for _, phases, structures in self.history:
+            for phase, ms in phases.items():
+                phase_totals[phase] = phase_totals.get(phase, 0.0) + ms
+                phase_peaks[phase] = max(phase_peaks.get(phase, 0.0), ms)
+            for name, (ms, updates) in structures.items():
+                total_ms, total_updates = structure_totals.get(name, (0.0, 0))
+                structure_totals[name] = (total_ms + ms, total_updates + updates)
+
+        # each row is a label, two right aligned values and the share of the frame drawn as a bar
+        rows = [("frame", f"{frame_avg:.2f} avg", f"{max(frame_times):.2f} max", None)]
+        for phase, total in phase_totals.items():
+            rows.append((phase, f"{total / frames:.2f} avg", f"{phase_peaks[phase]:.2f} max", total / frames / frame_avg))
+
+        rows.append(("structure updates", "ms", "per frame", None))
+        for name, (total_ms, total_updates) in sorted(structure_totals.items(), key=lambda pair: -pair[1][0]):
+            rows.append((name, f"{total_ms / frames:.3f}", f"{total_updates / frames:.1f}", total_ms / frames / frame_avg))
+
+        line_height = self.font.get_linesize()
+        columns = [200, 290]  # right edges of the two value columns
+        bar_width = 120
+        histogram_height = 60
+        width = 430
+        height = 5 + (len(rows) + 1) * line_height + histogram_height + 5
+
+        panel = pg.Surface((width, height), pg.SRCALPHA)
+        panel.fill((0, 0, 0, 190))
+
+        y = 5
+        for label, first, second, share in rows:
+            panel.blit(self.font.render(label, True, pg.Color("white")), (5, y))
+            for text, right in zip([first, second], columns):
+                value = self.font.render(text, True, pg.Color("white"))
+                panel.blit(value, (right - value.get_width(), y))
+            if share is not None:
+                pg.draw.rect(panel, c.working_color, (width - bar_width - 5, y + 4, max(1, int(bar_width * min(share, 1))), line_height - 8))
+            y += line_height
+
+        self.draw_histogram(panel, frame_times, 5, y + line_height, width - 10, histogram_height)
+        return panel
+
+    def draw_histogram(self, panel, frame_times, x, y, width, height):
+        counts = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        for frame_ms in frame_times:
+            counts[next((k for k, bound in enumerate(HISTOGRAM_BOUNDS) if frame_ms < bound), len(HISTOGRAM_BOUNDS))] += 1
+
+        title = self.font.render(f"frame times over the last {len(frame_times)} frames (ms)", True, pg.Color("white"))
+        panel.blit(title, (x, y - self.font.get_linesize()))
+
+        bin_width = width // len(counts)
+        labels = [f"<{bound}" for bound in HISTOGRAM_BOUNDS] + [f">{HISTOGRAM_BOUNDS[-1]}"]
+        for k, count in enumerate(counts):
+            # frames slower than 60 fps are drawn in red
+            color = c.full_color if k > HISTOGRAM_BOUNDS.index(17) else c.working_color
+            bar_height = int((height - 16) * count / max(counts))
+            pg.draw.rect(panel, color, (x + k * bin_width + 2, y + height - 16 - bar_height, bin_width - 4, bar_height))
+            label = self.font.render(labels[k], True, pg.Color("white"))
+            panel.blit(label, (x + k * bin_width + (bin_width - label.get_width()) // 2, y + height - 16))
+
+
+profiler = Profiler()
@@ -1,3 +1,5 @@
+import numpy as np
+
 from id_mapping import id_map
 
 
@@ -28,4 +30,18 @@ recipes.append({
     "inputs": {id_map["copper_wire"]: 2, id_map["iron"]: 1},
     "output": id_map["circuit"],
     "time": 2
-})
\ No newline at end of file
+})
+
+
+def compile_recipes(recipes):
+    """ Dense tables of the recipes, indexed by recipe number: the count of every item id each needs, their total, what it makes and how long it takes. """
+    inputs = np.zeros((len(recipes), len(id_map)), dtype=np.int16)
+    for k, recipe in enumerate(recipes):
+        for item, count in recipe["inputs"].items():
+            inputs[k, item] = count
+    outputs = np.array([recipe["output"] for recipe in recipes], dtype=np.int64)
+    times = np.array([recipe["time"] for recipe in recipes], dtype=np.float64)
+    return inputs, inputs.sum(axis=1).tolist(), outputs, times
+
+
+recipe_inputs, recipe_sizes, recipe_outputs, recipe_times = compile_recipes(recipes)
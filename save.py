@@ -0,0 +1,335 @@
+import gc
+import os
+import zipfile
+from contextlib import contextmanager
+from math import isnan
+import numpy as np
+
+from background import background
+from chunked_grid import MappedChunkedGrid
+from constants import consts as c
+from id_mapping import id_map
+from images import img as i
+from items import Item, item_manager as im
+from simulation import simulation
+from structures.arm import Arm
+from structures.conveyor import ConveyorUnderground
+from structures.production.event_calendar import calendar
+from structures.production.factory import Factory
+from structures.production.furnace import Furnace
+from structures.production.mine import Mine
+from structures.scheduler import scheduler
+from structures.splitter import Splitter
+from structures.structure import STRUCTURE_NAMES, structure_manager as sm
+from world import world as w
+
+"""
+    Save games. The whole factory is captured as a flat set of NumPy arrays, one per field, with
+    a row per structure, per item or per chunk of ore, and written as a compressed .npz file that np.load reads. The
+    state of one kind of structure lives in arrays of its own, indexed into the structure table,
+    and lists of different lengths (buffers, belt contents) are stored as the concatenated values
+    plus the offset where each list starts. Nothing is pickled.
+
+    Everything a structure or item carries from one tick to the next is saved, including the
+    calendar and the order the scheduler visits structures in, so a loaded game continues exactly
+    as the saved one would have. Items inside undergrounds and furnaces are not on the map and are
+    saved by kind only. A memory-mapped world (c.world_dir) is not copied into the save, only its
+    directory and the chunks mining changed are, and loading puts the chunks mined since back.
+"""
+
+VERSION = 5  # 2: chunks a save doesn't list are generated from "world.seed", 3: "world.amounts", 4: factory storage as counts, 5: mined chunks of a mapped world
+SAVE_DIR = "saves"
+QUICKSAVE = os.path.join(SAVE_DIR, "quicksave.npz")
+COMPRESSION = 1  # zlib level, higher levels take several times longer for files only slightly smaller
+
+layout_cache = {}  # the structure table of the last capture, with the structure manager revision it is valid for
+
+
+def save(file_path = QUICKSAVE):
+    write(capture(), file_path)
+    return file_path
+
+
+def load(file_path = QUICKSAVE):
+    with np.load(file_path, allow_pickle=False) as file:
+        restore({name: file[name] for name in file.files})
+
+
+def write(arrays, file_path):
+    """ Write captured arrays, replacing any earlier file only once the new one is complete. """
+    directory = os.path.dirname(file_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    # the same layout as np.savez_compressed, which always uses the slower default compression level
+    temporary = file_path + ".tmp"
+    with zipfile.ZipFile(temporary, "w", zipfile.ZIP_DEFLATED, compresslevel=COMPRESSION) as file:
+        for name, array in arrays.items():
+            with file.open(name + ".npy", "w", force_zip64=True) as member:
+                np.lib.format.write_array(member, np.asanyarray(array), allow_pickle=False)
+    os.replace(temporary, file_path)
+
+
+@contextmanager
+def paused_gc():
+    """ Hold off the cyclic garbage collector, which the many short-lived tuples of a capture or load would otherwise set off repeatedly. """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def capture():
+    """ The state of the game as a dict of freshly made arrays, which later ticks leave untouched. """
+    with paused_gc():
+        return capture_all()
+
+
+def capture_all():
+    arrays = {"version": np.array(VERSION)}
+    arrays.update(capture_world())
+
+    item_arrays, handles = im.snapshot()
+    arrays.update(item_arrays)
+    arrays.update(capture_structures({handle: k for k, handle in enumerate(handles)}))
+
+    arrays["simulation"] = np.array([simulation.ticks, simulation.time], dtype=np.float64)
+    arrays["view"] = np.array([c.player_x, c.player_y, c.cell_length], dtype=np.float64)
+    return arrays
+
+
+def capture_world():
+    if isinstance(w.grid, MappedChunkedGrid):
+        # a mapped world can be far larger than a save should be, it is saved in place and only what mining changed is copied
+        w.flush()
+        return {"world.directory": np.array(os.path.dirname(w.grid.file_path)), **capture_chunks(list(w.changed))}
+
+    # chunks not listed are generated again from the seed when needed
+    return {"world.seed": np.array(w.seed, dtype=np.int64), **capture_chunks(list(w.grid.chunks))}
+
+
+def capture_chunks(keys):
+    return {
+        "world.chunks": np.array(keys, dtype=np.int64).reshape(-1, 2),
+        "world.ore": np.array([w.grid.chunk(*key) for key in keys], dtype=np.int16).reshape(-1, c.chunk_size, c.chunk_size),
+        "world.amounts": np.array([w.amounts.chunk(*key) for key in keys], dtype=np.int32).reshape(-1, c.chunk_size, c.chunk_size),
+    }
+
+
+def capture_layout():
+    """ Which structures are where, reused from the previous capture while nothing was built, removed or rotated. """
+    if layout_cache.get("revision") == sm.revision:
+        return layout_cache["by_class"], layout_cache["index"], layout_cache["arrays"]
+
+    structures = sm.structures
+    index = {structure: k for k, structure in enumerate(structures)}
+
+    # one pass sorts the structures by class, the per-class state is then read class by class
+    by_class = {kind: [] for kind in STRUCTURE_NAMES}
+    for k, structure in enumerate(structures):
+        by_class[type(structure)].append((k, structure))
+
+    types = np.empty(len(structures), dtype=np.int8)
+    cells = np.empty((len(structures), 2), dtype=np.int32)
+    for kind, pairs in by_class.items():
+        if pairs:
+            rows = [k for k, _ in pairs]
+            types[rows] = id_map[STRUCTURE_NAMES[kind]]
+            if kind is ConveyorUnderground:
+                cells[rows] = [(structure.source_row, structure.source_col) for _, structure in pairs]
+            else:
+                cells[rows] = [(structure.row, structure.col) for _, structure in pairs]
+
+    # these arrays may still be read by an autosave being written, so they are replaced, never changed
+    arrays = {
+        "structures.type": types,
+        "structures.cell": cells,
+        "structures.direction": np.array([structure.direction for structure in structures], dtype=np.int8),
+        # a cell wakes its watchers in the order they started watching it, which rotations change
+        "scheduler.watching": np.array([index[structure] for structure in scheduler.watching], dtype=np.int32),
+    }
+    layout_cache.update(revision=sm.revision, by_class=by_class, index=index, arrays=arrays)
+    return by_class, index, arrays
+
+
+def capture_structures(item_rows):
+    by_class, index, layout = capture_layout()
+    of_type = lambda *kinds: [pair for kind in kinds for pair in by_class[kind]]
+
+    arrays = dict(layout)
+    arrays["scheduler.active"] = np.array([index[structure] for structure in scheduler.active], dtype=np.int32)
+
+    undergrounds = of_type(ConveyorUnderground)
+    arrays["underground.index"] = np.array([k for k, _ in undergrounds], dtype=np.int32)
+    arrays["underground.length"] = np.array([ug.length for _, ug in undergrounds], dtype=np.int8)
+    arrays["underground.offsets"], arrays["underground.storage"] = pack([[item.item for item in ug.storage] for _, ug in undergrounds], np.int16)
+    arrays["underground.timers"] = np.array([timer for _, ug in undergrounds for timer in ug.timers], dtype=np.float64)
+
+    splitters = of_type(Splitter)
+    arrays["splitter.index"] = np.array([k for k, _ in splitters], dtype=np.int32)
+    arrays["splitter.state"] = np.array([splitter.state for _, splitter in splitters], dtype=np.int8)
+    arrays["splitter.item"] = np.array([-1 if splitter.item is None else splitter.item for _, splitter in splitters], dtype=np.int16)
+    arrays["splitter.open"] = np.array([(splitter.target1_open, splitter.target2_open) for _, splitter in splitters], dtype=bool).reshape(-1, 2)
+
+    arms = of_type(Arm)
+    arrays["arm.index"] = np.array([k for k, _ in arms], dtype=np.int32)
+    arrays["arm.angle"] = np.array([arm.angle for _, arm in arms], dtype=np.float64)
+    arrays["arm.caught"] = np.array([-1 if arm.caught_item is None else item_rows[im.handle_of(arm.caught_item)] for _, arm in arms], dtype=np.int32)
+    arrays["arm.target_blocked"] = np.array([arm.target_blocked for _, arm in arms], dtype=bool)
+
+    units = of_type(Mine, Furnace, Factory)
+    arrays["unit.index"] = np.array([k for k, _ in units], dtype=np.int32)
+    arrays["unit.cycle"] = np.array([(optional(unit.started_at), optional(unit.finish_at)) for _, unit in units], dtype=np.float64).reshape(-1, 2)
+    arrays["unit.buffer_size"] = np.array([unit.buffer_size for _, unit in units], dtype=np.int32)
+    arrays["unit.offsets"], arrays["unit.buffer"] = pack([unit.buffer for _, unit in units], np.int16)
+
+    mines = of_type(Mine)
+    arrays["mine.index"] = np.array([k for k, _ in mines], dtype=np.int32)
+    arrays["mine.mining"] = np.array([-1 if mine.mining is None else mine.mining for _, mine in mines], dtype=np.int16)
+    arrays["mine.target_blocked"] = np.array([mine.target_blocked for _, mine in mines], dtype=bool)
+
+    furnaces = of_type(Furnace)
+    arrays["furnace.index"] = np.array([k for k, _ in furnaces], dtype=np.int32)
+    arrays["furnace.smelting"] = np.array([-1 if furnace.smelting is None else furnace.smelting.item for _, furnace in furnaces], dtype=np.int16)
+
+    factories = of_type(Factory)
+    arrays["factory.index"] = np.array([k for k, _ in factories], dtype=np.int32)
+    arrays["factory.recipe"] = np.array([-1 if factory.recipe is None else factory.recipe for _, factory in factories], dtype=np.int16)
+    arrays["factory.storage"] = np.array([factory.storage for _, factory in factories], dtype=np.int16).reshape(len(factories), len(id_map))
+
+    # events that were cancelled are left in the heap, only the pending ones are saved, in the order they are due
+    pending = sorted((at, counter, index[unit]) for at, counter, unit in calendar.events if calendar.pending.get(unit) == at)
+    arrays["calendar.time"] = np.array([calendar.time, calendar.previous_time], dtype=np.float64)
+    arrays["calendar.at"] = np.array([at for at, _, _ in pending], dtype=np.float64)
+    arrays["calendar.unit"] = np.array([k for _, _, k in pending], dtype=np.int32)
+    return arrays
+
+
+def restore(arrays):
+    """ Replace the running game with captured arrays. """
+    with paused_gc():
+        restore_all(arrays)
+
+
+def restore_all(arrays):
+    if int(arrays["version"]) != VERSION:
+        raise ValueError(f"save format version {int(arrays['version'])} is not supported, expected {VERSION}")
+
+    # the world first, the layers sm.clear() makes are mapped if the world is
+    restore_world(arrays)
+    sm.clear()
+    scheduler.clear()
+    calendar.clear()
+    background.surfaces.clear()
+
+    calendar.time, calendar.previous_time = arrays["calendar.time"].tolist()
+    ticks, simulation.time = arrays["simulation"].tolist()
+    simulation.ticks = int(ticks)
+
+    structures = []
+    for structure_type, (row, col), direction in zip(arrays["structures.type"].tolist(), arrays["structures.cell"].tolist(), arrays["structures.direction"].tolist()):
+        if structure_type == id_map["arm"]:
+            # the arm turns the direction it is built with around
+            direction = (direction + 2) % 4
+        structures.append(sm.build(row, col, structure_type, direction))
+
+    for k, length in zip(arrays["underground.index"].tolist(), arrays["underground.length"].tolist()):
+        structures[k].length = length
+        structures[k].init_target()
+        structures[k].calc_position()
+
+    sm.register_all(structures)
+    items = im.restore(arrays, sm)
+    restore_state(arrays, structures, items)
+
+    for k in arrays["scheduler.watching"].tolist():
+        scheduler.watch(structures[k])
+    scheduler.active = {structures[k]: None for k in arrays["scheduler.active"].tolist()}
+    for at, k in zip(arrays["calendar.at"].tolist(), arrays["calendar.unit"].tolist()):
+        calendar.schedule(at, structures[k])
+
+    player_x, player_y, cell_length = arrays["view"].tolist()
+    c.player_x, c.player_y = player_x, player_y
+    if int(cell_length) != c.cell_length:
+        c.cell_length = int(cell_length)
+        i.reload_images()
+
+
+def restore_world(arrays):
+    keys = [tuple(key) for key in arrays["world.chunks"].tolist()]
+    if "world.directory" in arrays:
+        directory = str(arrays["world.directory"])
+        if not isinstance(w.grid, MappedChunkedGrid) or os.path.dirname(w.grid.file_path) != directory:
+            w.open(directory)
+        # chunks mined since the save was made go back to how they were generated
+        for key in set(w.changed) - set(keys):
+            w.regenerate(*key)
+    else:
+        w.reset(int(arrays["world.seed"]))
+
+    for key, ore, amounts in zip(keys, arrays["world.ore"], arrays["world.amounts"]):
+        w.set_chunk(*key, ore, amounts)
+
+
+def restore_state(arrays, structures, items):
+    """ Set the state every kind of structure carries between ticks. """
+    undergrounds = [structures[k] for k in arrays["underground.index"].tolist()]
+    timers = arrays["underground.timers"].tolist()
+    start = 0
+    for ug, storage in zip(undergrounds, unpack(arrays["underground.offsets"], arrays["underground.storage"])):
+        ug.storage = [Item(ug.source_row, ug.source_col, kind) for kind in storage]
+        ug.timers = timers[start:start + len(storage)]
+        start += len(storage)
+
+    for k, state, item, (target1_open, target2_open) in zip(arrays["splitter.index"].tolist(), arrays["splitter.state"].tolist(), arrays["splitter.item"].tolist(), arrays["splitter.open"].tolist()):
+        splitter = structures[k]
+        splitter.state = state
+        splitter.item = None if item < 0 else item
+        splitter.target1_open, splitter.target2_open = target1_open, target2_open
+
+    for k, angle, caught, target_blocked in zip(arrays["arm.index"].tolist(), arrays["arm.angle"].tolist(), arrays["arm.caught"].tolist(), arrays["arm.target_blocked"].tolist()):
+        arm = structures[k]
+        arm.angle = angle
+        arm.caught_item = None if caught < 0 else items[caught]
+        arm.target_blocked = target_blocked
+
+    buffers = unpack(arrays["unit.offsets"], arrays["unit.buffer"])
+    for k, (started_at, finish_at), buffer_size, buffer in zip(arrays["unit.index"].tolist(), arrays["unit.cycle"].tolist(), arrays["unit.buffer_size"].tolist(), buffers):
+        unit = structures[k]
+        unit.started_at = None if isnan(started_at) else started_at
+        unit.finish_at = None if isnan(finish_at) else finish_at
+        unit.buffer_size = buffer_size
+        unit.buffer = buffer
+
+    for k, mining, target_blocked in zip(arrays["mine.index"].tolist(), arrays["mine.mining"].tolist(), arrays["mine.target_blocked"].tolist()):
+        structures[k].mining = None if mining < 0 else mining
+        structures[k].target_blocked = target_blocked
+
+    for k, smelting in zip(arrays["furnace.index"].tolist(), arrays["furnace.smelting"].tolist()):
+        furnace = structures[k]
+        furnace.smelting = None if smelting < 0 else Item(furnace.row, furnace.col, smelting)
+
+    for k, recipe, storage in zip(arrays["factory.index"].tolist(), arrays["factory.recipe"].tolist(), arrays["factory.storage"]):
+        factory = structures[k]
+        factory.recipe = None if recipe < 0 else recipe
+        factory.storage = storage.copy()
+        factory.stored = int(storage.sum())
+        factory.compose_recipe_text()
+
+
+def pack(lists, dtype):
+    """ Store lists of different lengths as the offsets where each one starts (and the last ends) and their values. """
+    offsets = np.cumsum([0] + [len(values) for values in lists], dtype=np.int64)
+    return offsets, np.array([value for values in lists for value in values], dtype=dtype)
+
+
+def unpack(offsets, values):
+    offsets, values = offsets.tolist(), values.tolist()
+    return [values[start:end] for start, end in zip(offsets, offsets[1:])]
+
+
+def optional(value):
+    return np.nan if value is None else value
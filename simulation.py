@@ -0,0 +1,39 @@
+from constants import consts as c
+from items import item_manager as im
+from profiler import profiler
+from structures.structure import structure_manager as sm
+
+
+class Simulation:
+    def __init__(self):
+        self.ticks = 0
+        self.time = 0.0
+
+    def update(self):
+        """ Advance the factory by one tick of c.dt seconds. """
+        sm.update()
+        profiler.lap("sm.update")
+        im.update(sm)
+        profiler.lap("im.update")
+
+        self.ticks += 1
+        self.time += c.dt
+
+    def step(self, n_ticks=1, dt=None):
+        """ Advance the factory by n_ticks ticks of a fixed dt, without polling events or drawing. """
+        if dt is None:
+            dt = 1.0 / c.fps
+
+        frame_dt = c.dt
+        c.dt = dt
+        try:
+            for _ in range(n_ticks):
+                self.update()
+        finally:
+            c.dt = frame_dt
+
+        return self.ticks
+
+
+simulation = Simulation()
+
@@ -1,6 +1,7 @@
 import pygame as pg
 from math import cos, pi, sin
 
+from camera import camera
 from constants import consts as c
 from id_mapping import id_map
 from images import img as i
@@ -10,6 +11,8 @@ from ui.game_ui import ui
 
 
 class Arm:
+    static = False
+
     def __init__(self, row, col, direction):
         self.row = row
         self.col = col
@@ -40,20 +43,30 @@ class Arm:
         else:
             self.angle -= c.arm_speed * c.dt
             self.constrain_angle()
-            self.caught_item.x = self.end_x + c.player_x
-            self.caught_item.y = self.end_y + c.player_y
+            self.caught_item.x = self.end_x
+            self.caught_item.y = self.end_y
 
             if abs(self.angle - self.stop_angle) % (2 * pi) < c.arm_speed * c.dt:
                 if not self.target_blocked and self.item_can_be_moved(sm, im):
-                    im.drop_item(self.caught_item, self.end_x + c.player_x, self.end_y + c.player_y)
+                    im.drop_item(self.caught_item, self.end_x, self.end_y)
                     self.caught_item = None
 
+    def is_idle(self, sm, im):
+        # waiting at the source with nothing it is allowed to pick up
+        if self.caught_item is not None or self.angle != self.start_angle:
+            return False
+        return im.grid[self.source_row][self.source_col] == 0 or self.target_blocked or not self.item_can_be_moved(sm, im)
+
+    def watched_cells(self):
+        return [(self.source_row, self.source_col), (self.target_row, self.target_col)]
+
     def render(self):
-        c.screen.blit(i.images[id_map["arm"]], (self.x - c.player_x, self.y - c.player_y))
-        pg.draw.line(c.screen, c.arm_color, (self.pivot_x, self.pivot_y), (self.end_x, self.end_y), 2)
+        self.calc_arm_coords()
+        c.screen.blit(i.images[id_map["arm"]], camera.to_screen(self.x, self.y))
+        pg.draw.line(c.screen, c.arm_color, camera.to_screen(self.pivot_x, self.pivot_y), camera.to_screen(self.end_x, self.end_y), 2)
 
         if self.caught_item is not None and self.target_blocked:
-            pg.draw.rect(c.screen, c.full_color, (self.x - c.player_x, self.y - c.player_y, c.cell_length, c.cell_length), 3)
+            pg.draw.rect(c.screen, c.full_color, (*camera.to_screen(self.x, self.y), c.cell_length, c.cell_length), 3)
 
     def render_tooltip(self):
         pg.draw.rect(c.screen, c.source_color, (self.source_col * c.cell_length - c.player_x, self.source_row * c.cell_length - c.player_y, c.cell_length, c.cell_length), 3)
@@ -133,15 +146,15 @@ class Arm:
         self.caught_item = None
 
     def calc_position(self):
-        self.x = self.col * c.cell_length
-        self.y = self.row * c.cell_length
+        self.x = self.col
+        self.y = self.row
 
     def calc_arm_coords(self):
-        self.pivot_x = self.x - c.player_x + c.cell_length // 2
-        self.pivot_y = self.y - c.player_y + c.cell_length // 2
+        self.pivot_x = self.x + 0.5
+        self.pivot_y = self.y + 0.5
 
-        self.end_x = self.pivot_x + c.cell_length * cos(self.angle)
-        self.end_y = self.pivot_y - c.cell_length * sin(self.angle)
+        self.end_x = self.pivot_x + cos(self.angle)
+        self.end_y = self.pivot_y - sin(self.angle)
 
     def safely_drop_item(self, im):
         if self.caught_item is not None:
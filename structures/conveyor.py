@@ -1,5 +1,6 @@
 import pygame as pg
 
+from camera import camera
 from constants import consts as c
 from id_mapping import id_map
 from images import img as i
@@ -7,6 +8,9 @@ from ui.game_ui import ui
 
 
 class Conveyor:
+    # drawn once into the cached background instead of every frame
+    static = True
+
     def __init__(self, row, col, direction):
         self.row = row
         self.col = col
@@ -17,8 +21,14 @@ class Conveyor:
     def update(self, sm, im):
         pass
 
+    def is_idle(self, sm, im):
+        return True
+
+    def watched_cells(self):
+        return []
+
     def render(self):
-        c.screen.blit(i.images[id_map["conveyor"]][self.direction], (self.x - c.player_x, self.y - c.player_y))
+        c.screen.blit(i.images[id_map["conveyor"]][self.direction], camera.to_screen(self.x, self.y))
 
     def render_tooltip(self):
         pg.draw.rect(c.screen, c.source_color, (self.source_col * c.cell_length - c.player_x, self.source_row * c.cell_length - c.player_y, c.cell_length, c.cell_length), 3)
@@ -29,8 +39,8 @@ class Conveyor:
         self.direction = (self.direction + direction) % 4
 
     def calc_position(self):
-        self.x = self.col * c.cell_length
-        self.y = self.row * c.cell_length
+        self.x = self.col
+        self.y = self.row
 
     def init_squares(self):
         if self.direction == 0:
@@ -56,6 +66,9 @@ class Conveyor:
 
 
 class ConveyorUnderground:
+    # drawn once into the cached background instead of every frame
+    static = True
+
     def __init__(self, row, col, direction):
         self.source_row = row
         self.source_col = col
@@ -89,15 +102,21 @@ class ConveyorUnderground:
             self.timers.append(0)
             im.remove(self.source_row, self.source_col)
 
+    def is_idle(self, sm, im):
+        return len(self.storage) == 0 and im.grid[self.source_row][self.source_col] == 0
+
+    def watched_cells(self):
+        return [(self.source_row, self.source_col), (self.target_row, self.target_col)]
+
     def render(self):
-        c.screen.blit(i.images[id_map["conveyor_underground"]][self.direction], (self.source_x - c.player_x, self.source_y - c.player_y))
-        c.screen.blit(i.images[id_map["conveyor_underground"]][self.direction + 4], (self.target_x - c.player_x, self.target_y - c.player_y))   
+        c.screen.blit(i.images[id_map["conveyor_underground"]][self.direction], camera.to_screen(self.source_x, self.source_y))
+        c.screen.blit(i.images[id_map["conveyor_underground"]][self.direction + 4], camera.to_screen(self.target_x, self.target_y))   
 
     def render_tooltip(self):
         pg.draw.line(
             c.screen, c.action_color, 
-            (self.source_x - c.player_x + c.cell_length // 2, self.source_y - c.player_y + c.cell_length // 2), 
-            (self.target_x - c.player_x + c.cell_length // 2, self.target_y - c.player_y + c.cell_length // 2), 
+            camera.to_screen(self.source_x + 0.5, self.source_y + 0.5), 
+            camera.to_screen(self.target_x + 0.5, self.target_y + 0.5), 
             3
         )
 
@@ -123,11 +142,11 @@ class ConveyorUnderground:
             self.target_col -= self.length
 
     def calc_position(self):
-        self.source_x = self.source_col * c.cell_length
-        self.source_y = self.source_row * c.cell_length
-        self.target_x = self.target_col * c.cell_length
-        self.target_y = self.target_row * c.cell_length
-        self.moving_time = self.length * c.cell_length / c.conveyor_speed
+        self.source_x = self.source_col
+        self.source_y = self.source_row
+        self.target_x = self.target_col
+        self.target_y = self.target_row
+        self.moving_time = self.length / c.conveyor_speed
 
     def can_accept_item(self, row, col):
         if row != self.source_row or col != self.source_col:
@@ -1,5 +1,5 @@
 from typing import List, Tuple, Optional
-from pytypes import typechecked
+from contracts import typechecked
 
 import pygame as pg
 from constants import consts as c
@@ -1,4 +1,4 @@
-from pytypes import typechecked
+from contracts import typechecked
 from typing import Optional, List
 
 import pygame as pg
@@ -0,0 +1,43 @@
+from heapq import heappop, heappush
+
+from structures.scheduler import scheduler
+
+"""
+    Simulation-time calendar for timed production. A unit schedules the moment its cycle ends
+    once, when the cycle starts, and sleeps until the calendar wakes it at that moment instead
+    of adding c.dt to a progress counter every frame.
+"""
+
+
+class EventCalendar:
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.time = 0.0
+        self.previous_time = 0.0
+        self.events = []
+        self.pending = {}  # unit -> the time its current event is due
+        self.counter = 0
+
+    def schedule(self, at, unit):
+        self.pending[unit] = at
+        self.counter += 1
+        heappush(self.events, (at, self.counter, unit))
+
+    def cancel(self, unit):
+        # the heap entry stays behind and is skipped when it comes up
+        self.pending.pop(unit, None)
+
+    def advance(self, dt):
+        self.previous_time = self.time
+        self.time += dt
+
+        while self.events and self.events[0][0] <= self.time:
+            at, _, unit = heappop(self.events)
+            if self.pending.get(unit) == at:
+                del self.pending[unit]
+                scheduler.wake(unit)
+
+
+calendar = EventCalendar()
@@ -1,13 +1,17 @@
-from pytypes import typechecked
-from typing import Optional, List, Union
+from contracts import typechecked
+from typing import Optional, Union
 import numpy as np
 
 import pygame as pg
 
+from camera import camera
 from constants import consts as c
 from id_mapping import id_map, reverse_id_map
 from images import img as i
-from recipes import recipes
+from history import SET_RECIPE as CHANGE_RECIPE, history
+from journal import SET_RECIPE, journal
+from recipes import recipe_inputs, recipe_outputs, recipe_sizes, recipe_times, recipes
+from structures.scheduler import scheduler
 from ui.game_ui import ui
 from structures.production.process_unit import ProcessUnit
 
@@ -15,8 +19,9 @@ class Factory(ProcessUnit):
     def __init__(self, row: int, col: int, direction: int):
         super().__init__(row, col)
         self.direction: int = direction
-        self.recipe: Optional[str] = None
-        self.storage: List[int] = []
+        self.recipe: Optional[int] = None  # row of the compiled recipe tables
+        self.storage: np.ndarray = np.zeros(len(id_map), dtype=np.int16)  # count of every item id stored
+        self.stored: int = 0  # total of storage
         self.init_target()
 
     @typechecked
@@ -27,33 +32,47 @@ class Factory(ProcessUnit):
         if im.grid[self.row][self.col] != 0:
             item_inside = im.grid[self.row][self.col]
             if self.will_accept_item(item_inside.item):
-                self.storage.append(item_inside.item)
+                self.storage[item_inside.item] += 1
+                self.stored += 1
             im.remove(self.row, self.col)
 
         if self.recipe_fulfilled():
-            self.progress += c.dt
+            if self.started_at is None:
+                self.start_cycle(float(recipe_times[self.recipe]))
 
-            if self.progress > recipes[self.recipe]["time"]:
-                if not self.is_buffer_full():
-                    self.progress = 0
-                    self.manage_buffer(recipes[self.recipe]["output"])
-                    self.storage = []
+            elif self.cycle_done() and not self.is_buffer_full():
+                self.clear_progress()
+                self.manage_buffer(int(recipe_outputs[self.recipe]))
+                self.empty_storage()
+                scheduler.notify(self.row, self.col)
 
         if len(self.buffer) > 0:
             if im.grid[self.target_row][self.target_col] == 0 and sm.item_can_be_placed(self.target_row, self.target_col):
                 im.add(self.target_row, self.target_col, self.buffer.pop(0))
+                scheduler.notify(self.row, self.col)
+
+    @typechecked
+    def is_idle(self, sm, im) -> bool:
+        if self.can_output(sm, im) or im.grid[self.row][self.col] != 0:
+            return False
+        if not self.recipe_fulfilled():
+            return True
+        if self.started_at is None:
+            return False
+        # the calendar wakes the factory when the recipe is crafted
+        return not self.cycle_done() or self.is_buffer_full()
 
     @typechecked
     def render(self) -> None:
-        c.screen.blit(i.images[id_map["factory"]], (self.x - c.player_x, self.y - c.player_y))
+        c.screen.blit(i.images[id_map["factory"]], camera.to_screen(self.x, self.y))
 
         if self.recipe is not None:
-            if self.progress != 0 and self.progress < recipes[self.recipe]["time"]:
-                pg.draw.rect(c.screen, c.working_color, (self.x - c.player_x, self.y - c.player_y, c.cell_length, c.cell_length), 2)
+            if self.progress != 0 and self.progress < recipe_times[self.recipe]:
+                pg.draw.rect(c.screen, c.working_color, (*camera.to_screen(self.x, self.y), c.cell_length, c.cell_length), 2)
             elif self.is_buffer_full():
-                pg.draw.rect(c.screen, c.full_color, (self.x - c.player_x, self.y - c.player_y, c.cell_length, c.cell_length), 3)
+                pg.draw.rect(c.screen, c.full_color, (*camera.to_screen(self.x, self.y), c.cell_length, c.cell_length), 3)
         else:
-            pg.draw.circle(c.screen, c.error_color, (self.x - c.player_x + c.cell_length // 2, self.y - c.player_y + c.cell_length // 2), 4 * c.cell_length // 5, 2)
+            pg.draw.circle(c.screen, c.error_color, camera.to_screen(self.x + 0.5, self.y + 0.5), 4 * c.cell_length // 5, 2)
 
     @typechecked
     def render_tooltip(self) -> None:
@@ -67,7 +86,7 @@ class Factory(ProcessUnit):
                 status = "FULL"
             elif self.progress == 0:
                 status = "WAITING"
-            elif self.progress < recipes[self.recipe]["time"]:
+            elif self.progress < recipe_times[self.recipe]:
                 status = "WORKING"
             else:
                 status = "ERROR"
@@ -84,12 +103,13 @@ class Factory(ProcessUnit):
     @typechecked
     def render_recipe(self) -> None:
         if self.recipe is not None:
-            rel_x = self.x - c.player_x + (c.cell_length - self.recipe_text.get_width()) // 2
+            screen_x, screen_y = camera.to_screen(self.x, self.y)
+            rel_x = screen_x + (c.cell_length - self.recipe_text.get_width()) // 2
 
             if self.direction == 0:
-                rel_y = self.y - c.player_y + 1.5 * c.cell_length
+                rel_y = screen_y + 1.5 * c.cell_length
             else:
-                rel_y = self.y - c.player_y - c.cell_length
+                rel_y = screen_y - c.cell_length
             pg.draw.rect(c.screen, pg.Color("black"), (rel_x - 5, rel_y - 5, self.recipe_text.get_width() + 10, self.recipe_text.get_height() + 10))
             c.screen.blit(self.recipe_text, (rel_x, rel_y))
 
@@ -100,10 +120,27 @@ class Factory(ProcessUnit):
         #print("Recipe is Type: ", type(recipe))
 
         if self.recipe is None or recipe is not None:
+            if recipe != self.recipe:
+                history.record(CHANGE_RECIPE, self.row, self.col, old=-1 if self.recipe is None else self.recipe, new=-1 if recipe is None else recipe)
             self.recipe = recipe
             self.compose_recipe_text()
-            self.storage = []
+            self.empty_storage()
             self.clear_progress()
+            journal.record(SET_RECIPE, self.row, self.col, -1 if recipe is None else recipe)
+
+    @typechecked
+    def clear_recipe(self) -> None:
+        """Remove the recipe, which set_recipe(None) keeps once one is set."""
+        history.record(CHANGE_RECIPE, self.row, self.col, old=-1 if self.recipe is None else self.recipe)
+        self.recipe = None
+        self.empty_storage()
+        self.clear_progress()
+        journal.record(SET_RECIPE, self.row, self.col, -1)
+
+    @typechecked
+    def empty_storage(self) -> None:
+        self.storage[:] = 0
+        self.stored = 0
 
     @typechecked
     def compose_recipe_text(self) -> None:
@@ -121,26 +158,16 @@ class Factory(ProcessUnit):
         if self.is_buffer_full():
             return False
 
-        if item in recipes[self.recipe]["inputs"]:
-            num_in_storage = self.storage.count(item)
-            if num_in_storage < recipes[self.recipe]["inputs"][item]:
-                return True
-            else:
-                return False
-        else:
-            return False
+        # items the recipe doesn't use are needed 0 times
+        return bool(self.storage[item] < recipe_inputs[self.recipe, item])
 
     @typechecked
     def recipe_fulfilled(self) -> bool:
         if self.recipe is None:
             return False
 
-        for item in recipes[self.recipe]["inputs"]:
-            num_in_storage = self.storage.count(item)
-            if num_in_storage < recipes[self.recipe]["inputs"][item]:
-                return False
-
-        return True
+        # no count goes over what the recipe needs, so the recipe is fulfilled once the total is reached
+        return self.stored == recipe_sizes[self.recipe]
 
     @typechecked
     def rotate(self, direction: int) -> None:
@@ -1,11 +1,13 @@
-from pytypes import typechecked
+from contracts import typechecked
 from typing import Optional, List
 
 import pygame as pg
 
+from camera import camera
 from constants import consts as c
 from id_mapping import id_map, reverse_id_map
 from images import img as i
+from structures.scheduler import scheduler
 from ui.game_ui import ui
 
 from structures.production.process_unit import ProcessUnit
@@ -23,20 +25,27 @@ class Furnace(ProcessUnit):
             if im.contains_ore(self.row, self.col):
                 self.smelting = im.grid[self.row][self.col]
                 im.remove(self.row, self.col)
+                self.start_cycle(c.smelt_time)
+        elif self.cycle_done() and not self.is_buffer_full():
+            smelted_item_index = self.get_smelted_item_index()
+            if smelted_item_index is not None:
+                self.manage_buffer(smelted_item_index)
+                self.smelting = None
                 self.clear_progress()
-        else:
-            if self.progress < c.smelt_time:
-                self.progress += c.dt
-            elif not self.is_buffer_full():
-                smelted_item_index = self.get_smelted_item_index()
-                if smelted_item_index is not None:
-                    self.manage_buffer(smelted_item_index)
-                    self.smelting = None
-                    self.clear_progress()
 
         if len(self.buffer) > 0:
             if im.grid[self.target_row][self.target_col] == 0 and sm.item_can_be_placed(self.target_row, self.target_col):
                 im.add(self.target_row, self.target_col, self.buffer.pop(0))
+                scheduler.notify(self.row, self.col)
+
+    @typechecked
+    def is_idle(self, sm, im) -> bool:
+        if self.can_output(sm, im):
+            return False
+        if self.smelting is None:
+            return not im.contains_ore(self.row, self.col)
+        # the calendar wakes the furnace when the ore is smelted
+        return not self.cycle_done() or self.is_buffer_full() or self.get_smelted_item_index() is None
 
     def get_smelted_item_index(self) -> Optional[int]:
         if self.smelting.item == id_map["iron_ore"]:
@@ -47,11 +56,11 @@ class Furnace(ProcessUnit):
 
     @typechecked
     def render(self) -> None:
-        c.screen.blit(i.images[id_map["furnace"]], (self.x - c.player_x, self.y - c.player_y))
+        c.screen.blit(i.images[id_map["furnace"]], camera.to_screen(self.x, self.y))
         if self.progress != 0 and self.progress < c.smelt_time:
-            pg.draw.rect(c.screen, c.working_color, (self.x - c.player_x, self.y - c.player_y, c.cell_length, c.cell_length), 2)
+            pg.draw.rect(c.screen, c.working_color, (*camera.to_screen(self.x, self.y), c.cell_length, c.cell_length), 2)
         elif self.is_buffer_full():
-            pg.draw.rect(c.screen, c.full_color, (self.x - c.player_x, self.y - c.player_y, c.cell_length, c.cell_length), 3)
+            pg.draw.rect(c.screen, c.full_color, (*camera.to_screen(self.x, self.y), c.cell_length, c.cell_length), 3)
 
     @typechecked
     def render_tooltip(self) -> None:
@@ -1,12 +1,15 @@
-from pytypes import typechecked
+from contracts import typechecked
 from typing import Optional
 
 import pygame as pg
 
+from background import background
+from camera import camera
 from constants import consts as c
 from id_mapping import id_map, reverse_id_map
 from images import img as i
 from world import world as w
+from structures.production.event_calendar import calendar
 from ui.game_ui import ui
 from structures.production.process_unit import ProcessUnit
 
@@ -20,30 +23,41 @@ class Mine(ProcessUnit):
 
     @typechecked
     def update(self, sm, im) -> None:
+        start = calendar.time
+        if self.mining is not None and self.cycle_done() and not self.is_buffer_full():
+            self.manage_buffer(self.mining)
+            self.mining = None
+            start = self.finish_cycle()
+            if w.mine(self.row, self.col) == 0:
+                # the cell is bare now, is_idle puts the mine to sleep for good
+                background.clear_ore(self.row, self.col)
+
         if self.mining is None and not self.is_buffer_full():
             if w.grid[self.row][self.col] > 0:
                 self.mining = w.grid[self.row][self.col]
-                self.clear_progress()
-        else:
-            if self.progress < c.mine_time:
-                self.progress += c.dt
-            elif not self.is_buffer_full():
-                self.manage_buffer(self.mining)
-                self.mining = None
-                self.clear_progress()
+                self.start_cycle(c.mine_time, start)
 
         if len(self.buffer) > 0:
             if im.grid[self.target_row][self.target_col] == 0 and sm.item_can_be_placed(self.target_row, self.target_col):
                 im.add(self.target_row, self.target_col, self.buffer.pop(0))
 
+    @typechecked
+    def is_idle(self, sm, im) -> bool:
+        if self.can_output(sm, im):
+            return False
+        if self.mining is None:
+            return self.is_buffer_full() or w.grid[self.row][self.col] == 0
+        # the calendar wakes the mine when the ore is mined
+        return not self.cycle_done() or self.is_buffer_full()
+
     @typechecked
     def render(self) -> None:
-        c.screen.blit(i.images[id_map["mine"]], (self.x - c.player_x, self.y - c.player_y))
+        c.screen.blit(i.images[id_map["mine"]], camera.to_screen(self.x, self.y))
 
         if self.progress != 0 and self.progress < c.mine_time:
-            pg.draw.rect(c.screen, c.working_color, (self.x - c.player_x, self.y - c.player_y, c.cell_length, c.cell_length), 2)
+            pg.draw.rect(c.screen, c.working_color, (*camera.to_screen(self.x, self.y), c.cell_length, c.cell_length), 2)
         elif self.is_buffer_full():
-            pg.draw.rect(c.screen, c.full_color, (self.x - c.player_x, self.y - c.player_y, c.cell_length, c.cell_length), 3)
+            pg.draw.rect(c.screen, c.full_color, (*camera.to_screen(self.x, self.y), c.cell_length, c.cell_length), 3)
 
     @typechecked
     def render_tooltip(self) -> None:
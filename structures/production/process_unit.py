@@ -1,16 +1,18 @@
 from abc import ABC, abstractmethod
-from pytypes import typechecked
-from typing import List, Optional, Union
+from contracts import typechecked
+from typing import List, Optional, Tuple, Union
 import numpy as np
 
 from structures.shared import Structure
+from structures.production.event_calendar import calendar
 from constants import consts as c
 
 class ProcessUnit(Structure, ABC):
     def __init__(self, row: int, col: int):
         super().__init__(row, col)
         self.buffer: List[Optional[Union[int, np.int64]]] = []  
-        self.progress: int = 0
+        self.started_at: Optional[float] = None
+        self.finish_at: Optional[float] = None
         self.buffer_size: int = c.buffer_size  # Assuming there's a constant buffer size
 
     @typechecked
@@ -19,6 +21,22 @@ class ProcessUnit(Structure, ABC):
         """Process or move items if conditions are met, to be implemented specifically in each unit."""
         pass
 
+    @typechecked
+    @abstractmethod
+    def is_idle(self, sm, im) -> bool:
+        """Check if the unit cannot make progress until one of its watched cells changes."""
+        pass
+
+    @typechecked
+    def watched_cells(self) -> List[Tuple[int, int]]:
+        """Cells whose item or structure changes can let the unit make progress again."""
+        return [(self.row, self.col), (self.target_row, self.target_col)]
+
+    @typechecked
+    def can_output(self, sm, im) -> bool:
+        """Check if the next buffered item could be placed on the target cell."""
+        return len(self.buffer) > 0 and im.grid[self.target_row][self.target_col] == 0 and sm.item_can_be_placed(self.target_row, self.target_col)
+
     @typechecked
     @abstractmethod
     def render(self) -> None:
@@ -37,7 +55,36 @@ class ProcessUnit(Structure, ABC):
         """Check if the buffer is full."""
         return len(self.buffer) >= self.buffer_size
 
+    @property
+    def progress(self) -> float:
+        """Seconds spent on the current cycle, 0 when no cycle is running."""
+        if self.started_at is None:
+            return 0
+        return calendar.time - self.started_at
+
+    @typechecked
+    def start_cycle(self, duration: float, start: Optional[float] = None) -> None:
+        """Start a cycle and schedule its completion, so the unit can sleep until then."""
+        self.started_at = calendar.time if start is None else start
+        self.finish_at = self.started_at + duration
+        calendar.schedule(self.finish_at, self)
+
+    @typechecked
+    def cycle_done(self) -> bool:
+        """Check if the current cycle has run its full time."""
+        return self.finish_at is not None and calendar.time >= self.finish_at
+
+    @typechecked
+    def finish_cycle(self) -> float:
+        """End the current cycle, returning the time the next one can be counted from."""
+        # a cycle collected in the tick it finished in hands over its exact end time
+        start = self.finish_at if self.finish_at > calendar.previous_time else calendar.time
+        self.clear_progress()
+        return start
+
     @typechecked
     def clear_progress(self) -> None:
         """Reset progress for the next cycle."""
-        self.progress = 0
+        self.started_at = None
+        self.finish_at = None
+        calendar.cancel(self)
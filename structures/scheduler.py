@@ -0,0 +1,60 @@
+"""
+    Keeps track of which structures can make progress, so StructureManager.update only visits those.
+
+    A structure reports through is_idle(sm, im) that nothing will change until one of its
+    watched_cells() changes, and is then put to sleep. Any change to the item or structure grid
+    calls notify(row, col), which wakes every sleeping structure watching that cell.
+"""
+
+
+class Scheduler:
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.active = {}    # awake structures, in the order they will be updated
+        self.watchers = {}  # (row, col) -> structures watching that cell, in the order they started watching
+        self.watching = {}  # structure -> the cells it watches
+
+    def add(self, structure):
+        self.watch(structure)
+        self.wake(structure)
+
+    def remove(self, structure):
+        self.unwatch(structure)
+        self.sleep(structure)
+
+    def refresh(self, structure):
+        """ Re-register a structure whose source or target cells moved, e.g. after a rotation. """
+        self.unwatch(structure)
+        self.add(structure)
+
+    def watch(self, structure):
+        cells = structure.watched_cells()
+        self.watching[structure] = cells
+        for cell in cells:
+            self.watchers.setdefault(cell, {})[structure] = None
+
+    def unwatch(self, structure):
+        for cell in self.watching.pop(structure, []):
+            self.watchers[cell].pop(structure, None)
+            if not self.watchers[cell]:
+                del self.watchers[cell]
+
+    def wake(self, structure):
+        self.active[structure] = None
+
+    def sleep(self, structure):
+        self.active.pop(structure, None)
+
+    def notify(self, row, col):
+        for structure in self.watchers.get((row, col), ()):
+            self.active[structure] = None
+
+    def notify_cells(self, rows, cols):
+        for cell in zip(rows, cols):
+            for structure in self.watchers.get(cell, ()):
+                self.active[structure] = None
+
+
+scheduler = Scheduler()
@@ -1,9 +1,11 @@
 from typing import Tuple
 from constants import consts as c
-from pytypes import typechecked
+from contracts import typechecked
 from abc import ABC, abstractmethod
 
 class Structure(ABC):
+    static = False
+
     def __init__(self, row: int, col: int) -> None:
         self.row: int = row
         self.col: int = col
@@ -13,9 +15,9 @@ class Structure(ABC):
 
     @typechecked
     def calc_position(self) -> None:
-        """ Calculate the screen (x, y) position from the grid (row, col) position. """
-        self.x = self.col * c.cell_length
-        self.y = self.row * c.cell_length
+        """ Calculate the world (x, y) position, in cells, from the grid (row, col) position. """
+        self.x = self.col
+        self.y = self.row
 
     @typechecked
     @abstractmethod
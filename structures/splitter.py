@@ -1,5 +1,6 @@
 import pygame as pg
 
+from camera import camera
 from constants import consts as c
 from id_mapping import id_map
 from images import img as i
@@ -7,6 +8,9 @@ from ui.game_ui import ui
 
 
 class Splitter:
+    # drawn once into the cached background instead of every frame
+    static = True
+
     def __init__(self, row, col, direction):
         self.row = row
         self.col = col
@@ -54,6 +58,12 @@ class Splitter:
                     self.state = 2
                     self.target1_open = False
 
+    def is_idle(self, sm, im):
+        return im.grid[self.row][self.col] == 0 or not (self.target1_open or self.target2_open)
+
+    def watched_cells(self):
+        return [(self.row, self.col), (self.target1_row, self.target1_col), (self.target2_row, self.target2_col)]
+
     @staticmethod
     def can_be_directed_to(sm, im, row, col):
         return im.grid[row][col] == 0 and sm.item_can_be_placed(row, col)
@@ -70,7 +80,7 @@ class Splitter:
         return self.target1_open or self.target2_open
 
     def render(self):
-        c.screen.blit(i.images[id_map["splitter"]][self.direction], (self.x - c.player_x, self.y - c.player_y))
+        c.screen.blit(i.images[id_map["splitter"]][self.direction], camera.to_screen(self.x, self.y))
 
     def rotate(self, rotation):
         self.direction = (self.direction + rotation) % 4
@@ -89,8 +99,8 @@ class Splitter:
         ui.render_text(f"Splitter [{status}]: (L/R) to rotate")
 
     def calc_position(self):
-        self.x = self.col * c.cell_length
-        self.y = self.row * c.cell_length
+        self.x = self.col
+        self.y = self.row
 
     def init_targets(self):
         if self.direction == 0:
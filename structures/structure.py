@@ -12,108 +12,473 @@ from structures.production.factory import Factory
 from structures.production.furnace import Furnace
 from structures.production.mine import Mine
 
+from contextlib import contextmanager
+from time import perf_counter
+import numpy as np
+
+from background import background
+from camera import camera
+from chunked_grid import ChunkedGrid
 from constants import consts as c
 from id_mapping import id_map
 from items import item_manager as im
+from profiler import profiler
+from structures.production.event_calendar import calendar
+from structures.scheduler import scheduler
+from structures.transport_line import COL_STEP, ROW_STEP
+from tracing import tracer
+from world import world as w
 from ui.recipe_selection import select_recipe
 
-from typing import Tuple
 from images import img as i
-from pytypes import typechecked
-from abc import ABC, abstractmethod
+from history import history
+import history as h
+from journal import ADD, REMOVE, ROTATE, journal
 
 
 class StructureManager:
     def __init__(self):
-        self.grid = []
-        for _ in range(c.num_cells):
-            new_row = [0 for _ in range(c.num_cells)]
-            self.grid.append(new_row)
+        self.revision = 0  # counts changes to which structures are where, so saves can reuse an unchanged layout
+        self.changed_conveyors = None  # while batched(), cells whose transport lines still have to be re-detected
+        self.removed = None            # and structures still to be taken out of the list
+        self.clear()
+
+    def clear(self):
+        self.revision += 1
+        self.grid = ChunkedGrid()
         self.structures = []
+        self.chunk_structures = {}  # chunk coordinate -> structures with a cell in it, for culled rendering
+
+        # per-cell structure type and direction (-1 where empty), for vectorized lookups
+        self.type_grid = w.layer("types", -1, np.int8)
+        self.dir_grid = ChunkedGrid(-1, np.int8)
+
+    @contextmanager
+    def batched(self):
+        """ Make many adds, removes and rotations at once, re-detecting transport lines and updating the structure list once at the end. """
+        self.changed_conveyors = []
+        self.removed = set()
+        try:
+            yield
+        finally:
+            changed_conveyors, removed = self.changed_conveyors, self.removed
+            self.changed_conveyors = self.removed = None
+            if removed:
+                self.structures = [structure for structure in self.structures if structure not in removed]
+            if changed_conveyors:
+                im.structure_changed(self, changed_conveyors)
 
     def update(self):
-        for structure in self.structures:
+        calendar.advance(c.dt)
+        if profiler.enabled or (tracer.enabled and tracer.structures):
+            self.update_profiled()
+            return
+
+        # only structures that can make progress are visited, the rest sleep until a watched cell changes
+        for structure in list(scheduler.active):
+            structure.update(self, im)
+            if structure.is_idle(self, im):
+                scheduler.sleep(structure)
+
+    def update_profiled(self):
+        """ The same as update, timing every structure update for the profiler and the tracer. """
+        tracing = tracer.enabled and tracer.structures
+        for structure in list(scheduler.active):
+            start = perf_counter()
             structure.update(self, im)
+            if structure.is_idle(self, im):
+                scheduler.sleep(structure)
+
+            end = perf_counter()
+            if profiler.enabled:
+                profiler.add_structure_time(type(structure).__name__, end - start)
+            if tracing:
+                tracer.record(type(structure).__name__, "structure", start, end, self.cells_of(structure)[0])
 
     def render(self):
-        for structure in self.structures:
-            structure.render()
+        visible = {}
+        for chunk in camera.visible_chunks():
+            visible.update(self.chunk_structures.get(chunk, {}))
 
-    def add(self, row, col, structure_type, direction):
+        first_row, last_row, first_col, last_col = camera.visible_cells()
+        for structure in visible:
+            if structure.static:
+                continue
+            for row, col in self.cells_of(structure):
+                if first_row <= row < last_row and first_col <= col < last_col:
+                    structure.render()
+                    break
+
+    def add(self, row, col, structure_type, direction, quiet = False):
         if self.grid[row][col] == 0:
-            if structure_type == id_map["conveyor"]:
-                new_structure = Conveyor(row, col, direction)
-                c.conveyor_placed.play()
-            elif structure_type == id_map["conveyor_underground"]:
-                new_structure = ConveyorUnderground(row, col, direction)
-                c.conveyor_placed.play()
-            elif structure_type == id_map["splitter"]:
-                new_structure = Splitter(row, col, direction)
-                c.conveyor_placed.play()
-            elif structure_type == id_map["arm"]:
-                new_structure = Arm(row, col, direction)
-                c.arm_placed.play()
-            elif structure_type == id_map["mine"]:
-                new_structure = Mine(row, col, direction)
-                c.mine_placed.play()
-            elif structure_type == id_map["furnace"]:
-                new_structure = Furnace(row, col, direction)
-                c.furnace_placed.play()
-            elif structure_type == id_map["factory"]:
-                new_structure = Factory(row, col, direction)
-                c.factory_placed.play()
+            new_structure = self.build(row, col, structure_type, direction)
+            if not quiet:
+                self.placed_sound(structure_type).play()
 
             if im.grid[row][col] != 0 and not isinstance(new_structure, Conveyor):
                 im.remove(row, col)
 
-            self.grid[row][col] = new_structure
-            if isinstance(new_structure, ConveyorUnderground):
-                self.grid[new_structure.target_row][new_structure.target_col] = new_structure
+            self.register(new_structure)
+            self.redraw(new_structure)
+            if type(new_structure) == Conveyor:
+                self.conveyor_changed(row, col)
 
-            self.structures.append(new_structure)
+            scheduler.add(new_structure)
+            self.notify_cells(new_structure)
+            journal.record(ADD, row, col, structure_type, direction, c.ug_state)
+            history.record(h.ADD, row, col, structure_type, direction, c.ug_state)
 
         elif isinstance(self.grid[row][col], Factory):
             factory = self.grid[row][col]
-            selected_recipe = select_recipe()
+            with tracer.span("select_recipe", "ui"):
+                selected_recipe = select_recipe()
             factory.set_recipe(selected_recipe)
+            scheduler.wake(factory)
+
+    def add_many(self, cells, structure_types, directions, lengths = None, quiet = False):
+        """
+            Place structures on every free cell of a sequence of (row, col) at once, e.g. a dragged line or a blueprint,
+            with a single sound. Type, direction and underground length are one for all cells or one per cell, the
+            length defaulting to c.ug_state. Returns the structures placed.
+        """
+        columns = self.buildable(cells, structure_types, directions, lengths)
+        if len(columns) == 0:
+            return []
+
+        placed = []
+        ug_state = c.ug_state
+        for row, col, structure_type, direction, length in columns.tolist():
+            c.ug_state = length
+            placed.append(self.build(row, col, structure_type, direction))
+        c.ug_state = ug_state
+        if not quiet:
+            self.placed_sound(int(columns[0, 2])).play()
+
+        rows, cols, types, directions, lengths = columns.T
+        for row, col in columns[types != id_map["conveyor"], :2].tolist():
+            if im.grid.get(row, col) != 0:
+                im.remove(row, col)
+
+        self.register_all(placed)
+        for structure in placed:
+            self.redraw(structure)
+            scheduler.add(structure)
+        cells = [cell for structure in placed for cell in self.cells_of(structure)]
+        scheduler.notify_cells(*zip(*cells))
+        conveyors = types == id_map["conveyor"]
+        if conveyors.any():
+            self.conveyors_changed(list(zip(rows[conveyors].tolist(), cols[conveyors].tolist())))
+
+        journal.record_all(ADD, rows, cols, types, directions, lengths)
+        history.record_all(h.ADD, rows, cols, types, directions, lengths)
+        return placed
+
+    def buildable(self, cells, structure_types, directions, lengths):
+        """ The (row, col, type, direction, length) rows add_many builds, each cell once and in the order given, leaving out occupied ones. """
+        cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+        lengths = c.ug_state if lengths is None else lengths
+        columns = np.stack(np.broadcast_arrays(cells[:, 0], cells[:, 1], structure_types, directions, lengths), axis=1).astype(np.int64)
+        _, first = np.unique(cell_keys(columns[:, 0], columns[:, 1]), return_index=True)
+        columns = columns[np.sort(first)]
+        columns = columns[self.type_grid[columns[:, 0], columns[:, 1]] == -1]
 
-    def remove(self, row, col):
+        # an underground's far end has to be free as well, also of the ones placed before it
+        undergrounds = np.flatnonzero(columns[:, 2] == id_map["conveyor_underground"])
+        if len(undergrounds) == 0:
+            return columns
+        ug_directions, ug_lengths = columns[undergrounds, 3], columns[undergrounds, 4]
+        far_rows = columns[undergrounds, 0] + ROW_STEPS[ug_directions] * ug_lengths
+        far_cols = columns[undergrounds, 1] + COL_STEPS[ug_directions] * ug_lengths
+        keep = np.ones(len(columns), dtype=bool)
+        keep[undergrounds] = self.type_grid[far_rows, far_cols] == -1
+
+        # only structures sharing a cell with another one of this call depend on what is placed first
+        keys = cell_keys(columns[:, 0], columns[:, 1])
+        far_keys = cell_keys(far_rows, far_cols)
+        every_key, counts = np.unique(np.concatenate([keys, far_keys]), return_counts=True)
+        shared = every_key[counts > 1]
+        if len(shared):
+            contested = np.isin(keys, shared)
+            contested[undergrounds] |= np.isin(far_keys, shared)
+            far_of = dict(zip(undergrounds.tolist(), far_keys.tolist()))
+            claimed = set()
+            for k in np.flatnonzero(contested & keep).tolist():
+                structure_keys = [int(keys[k])] + ([far_of[k]] if k in far_of else [])
+                if any(key in claimed for key in structure_keys):
+                    keep[k] = False
+                else:
+                    claimed.update(structure_keys)
+
+        return columns[keep]
+
+    def build(self, row, col, structure_type, direction):
+        """ Create a structure without placing it, as add does for the player. """
+        if structure_type == id_map["conveyor"]:
+            return Conveyor(row, col, direction)
+        elif structure_type == id_map["conveyor_underground"]:
+            return ConveyorUnderground(row, col, direction)
+        elif structure_type == id_map["splitter"]:
+            return Splitter(row, col, direction)
+        elif structure_type == id_map["arm"]:
+            return Arm(row, col, direction)
+        elif structure_type == id_map["mine"]:
+            return Mine(row, col, direction)
+        elif structure_type == id_map["furnace"]:
+            return Furnace(row, col, direction)
+        elif structure_type == id_map["factory"]:
+            return Factory(row, col, direction)
+
+    def placed_sound(self, structure_type):
+        if structure_type in [id_map["conveyor"], id_map["conveyor_underground"], id_map["splitter"]]:
+            return c.conveyor_placed
+        elif structure_type == id_map["arm"]:
+            return c.arm_placed
+        elif structure_type == id_map["mine"]:
+            return c.mine_placed
+        elif structure_type == id_map["furnace"]:
+            return c.furnace_placed
+        return c.factory_placed
+
+    def register(self, structure):
+        """ Put a built structure into the grids and lists, without sounds, redraws or waking anything. """
+        self.revision += 1
+        structure_type = id_map[STRUCTURE_NAMES[type(structure)]]
+        for row, col in self.cells_of(structure):
+            self.grid[row][col] = structure
+            self.type_grid[row, col] = structure_type
+            self.dir_grid[row, col] = structure.direction
+
+        self.structures.append(structure)
+        for chunk in self.chunks_of(structure):
+            self.chunk_structures.setdefault(chunk, {})[structure] = None
+
+    def register_all(self, structures):
+        """ register for many structures at once, writing the type and direction layers in bulk. """
+        self.revision += 1
+        rows, cols, types, directions = [], [], [], []
+        for structure in structures:
+            structure_type = id_map[STRUCTURE_NAMES[type(structure)]]
+            for row, col in self.cells_of(structure):
+                self.grid.set(row, col, structure)
+                self.chunk_structures.setdefault(self.grid.chunk_of(row, col), {})[structure] = None
+                rows.append(row)
+                cols.append(col)
+                types.append(structure_type)
+                directions.append(structure.direction)
+
+        self.structures.extend(structures)
+
+        if rows:
+            self.type_grid[rows, cols] = types
+            self.dir_grid[rows, cols] = directions
+
+    def remove(self, row, col, quiet = False):
         if self.grid[row][col] != 0:
             structure = self.grid[row][col]
+            self.revision += 1
 
             if isinstance(structure, Arm):
                 structure.safely_drop_item(im)
 
-            if type(structure) not in [Conveyor, ConveyorUnderground, Splitter]:
-                c.structure_destroy.play()
-            else:
-                c.conveyor_pick_up.play()
+            if not quiet:
+                self.removed_sound(structure).play()
 
             if isinstance(structure, ConveyorUnderground):
                 self.grid[structure.source_row][structure.source_col] = 0
                 self.grid[structure.target_row][structure.target_col] = 0
+                for cell in [(structure.source_row, structure.source_col), (structure.target_row, structure.target_col)]:
+                    self.type_grid[cell] = -1
+                    self.dir_grid[cell] = -1
 
             self.grid[row][col] = 0
-            self.structures.remove(structure)
+            self.type_grid[row, col] = -1
+            self.dir_grid[row, col] = -1
+            if self.removed is None:
+                self.structures.remove(structure)
+            else:
+                self.removed.add(structure)
+            for chunk in self.chunks_of(structure):
+                del self.chunk_structures[chunk][structure]
+            self.redraw(structure)
+            if type(structure) == Conveyor:
+                self.conveyor_changed(row, col)
+
+            scheduler.remove(structure)
+            calendar.cancel(structure)
+            self.notify_cells(structure)
+            journal.record(REMOVE, row, col)
+            if history.recording():
+                # what it takes to build it again
+                history.record(h.REMOVE, *self.cells_of(structure)[0], id_map[STRUCTURE_NAMES[type(structure)]], self.built_direction(structure), getattr(structure, "length", 0), self.recipe_of(structure))
+
+    def remove_many(self, cells, quiet = False):
+        """ Take away the structures on a sequence of (row, col) at once, e.g. when undoing a drag, with a single sound. Returns the structures removed. """
+        cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+        cells = cells[self.type_grid[cells[:, 0], cells[:, 1]] != -1]
+        removed = {}  # structure -> the cell it was removed by
+        for row, col in cells.tolist():
+            removed.setdefault(self.grid.get(row, col), (row, col))
+        if not removed:
+            return []
+
+        self.revision += 1
+        if not quiet:
+            self.removed_sound(next(iter(removed))).play()
 
-    def rotate(self, row, col, direction = 1):
+        rows, cols, conveyors = [], [], []
+        for structure in removed:
+            if isinstance(structure, Arm):
+                structure.safely_drop_item(im)
+            for row, col in self.cells_of(structure):
+                self.grid.set(row, col, 0)
+                rows.append(row)
+                cols.append(col)
+            for chunk in self.chunks_of(structure):
+                del self.chunk_structures[chunk][structure]
+            self.redraw(structure)
+            if type(structure) == Conveyor:
+                conveyors.append((structure.row, structure.col))
+            scheduler.remove(structure)
+            calendar.cancel(structure)
+
+        self.type_grid[rows, cols] = -1
+        self.dir_grid[rows, cols] = -1
+        if self.removed is None:
+            self.structures = [structure for structure in self.structures if structure not in removed]
+        else:
+            self.removed.update(removed)
+        if conveyors:
+            self.conveyors_changed(conveyors)
+        scheduler.notify_cells(rows, cols)
+
+        journal.record_all(REMOVE, *zip(*removed.values()))
+        if history.recording():
+            first_cells = [self.cells_of(structure)[0] for structure in removed]
+            history.record_all(h.REMOVE, *zip(*first_cells), [id_map[STRUCTURE_NAMES[type(structure)]] for structure in removed],
+                               [self.built_direction(structure) for structure in removed], [getattr(structure, "length", 0) for structure in removed],
+                               [self.recipe_of(structure) for structure in removed])
+        return list(removed)
+
+    def removed_sound(self, structure):
+        if type(structure) not in [Conveyor, ConveyorUnderground, Splitter]:
+            return c.structure_destroy
+        return c.conveyor_pick_up
+
+    def recipe_of(self, structure):
+        """ The recipe a removed structure has to be given back when it is built again, -1 for none. """
+        if isinstance(structure, Factory) and structure.recipe is not None:
+            return structure.recipe
+        return -1
+
+    def rotate(self, row, col, direction = 1, quiet = False):
         if self.grid[row][col] != 0:
             structure = self.grid[row][col]
+            self.revision += 1
             if type(structure) == Arm:
                 structure.safely_drop_item(im)
                 structure.rotate(direction)
-                c.rotate.play()
-
             elif type(structure) != ConveyorUnderground:
                 structure.rotate(direction)
+
+            if type(structure) != ConveyorUnderground and not quiet:
                 c.rotate.play()
 
+            self.dir_grid[row, col] = structure.direction
+            self.redraw(structure)
+            if type(structure) == Conveyor:
+                self.conveyor_changed(row, col)
+
+            scheduler.refresh(structure)
+            self.notify_cells(structure)
+            journal.record(ROTATE, row, col, direction=direction)
+            history.record(h.ROTATE, row, col, direction=direction)
+
+    def conveyor_changed(self, row, col):
+        self.conveyors_changed([(row, col)])
+
+    def conveyors_changed(self, cells):
+        if self.changed_conveyors is None:
+            im.structure_changed(self, cells)
+        else:
+            self.changed_conveyors.extend(cells)
+
+    def built_direction(self, structure):
+        """ The direction add has to be given to build a structure facing the way it does. """
+        if isinstance(structure, Arm):
+            # arms turn the direction they are built with around
+            return (structure.direction + 2) % 4
+        return structure.direction
+
+    def notify_cells(self, structure):
+        """ Wake whatever is watching the cells a structure occupies. """
+        if isinstance(structure, ConveyorUnderground):
+            scheduler.notify(structure.source_row, structure.source_col)
+            scheduler.notify(structure.target_row, structure.target_col)
+        else:
+            scheduler.notify(structure.row, structure.col)
+
+    def redraw(self, structure):
+        """ Drop the cached background under a static structure that changed. """
+        if structure.static:
+            for row, col in self.cells_of(structure):
+                background.invalidate(row, col)
+
+    def cells_of(self, structure):
+        """ Return the grid cells a structure occupies. """
+        if isinstance(structure, ConveyorUnderground):
+            return [(structure.source_row, structure.source_col), (structure.target_row, structure.target_col)]
+        return [(structure.row, structure.col)]
+
+    def chunks_of(self, structure):
+        return {self.grid.chunk_of(row, col) for row, col in self.cells_of(structure)}
+
     def item_can_be_placed(self, row, col):
         return self.grid[row][col] == 0 or type(self.grid[row][col]) in [Conveyor, ConveyorUnderground, Splitter]
-    
-    def apply_zoom(self):
-        for structure in self.structures:
-            structure.calc_position()
+
+
+STRUCTURE_NAMES = {
+    Conveyor: "conveyor",
+    ConveyorUnderground: "conveyor_underground",
+    Splitter: "splitter",
+    Arm: "arm",
+    Mine: "mine",
+    Furnace: "furnace",
+    Factory: "factory",
+}
+
+
+# row / column offsets of the four directions, as arrays for indexing with directions
+ROW_STEPS = np.array(ROW_STEP)
+COL_STEPS = np.array(COL_STEP)
+
+
+def cell_keys(rows, cols):
+    """ One int64 per cell, for finding repeated cells with np.unique and np.isin. """
+    return np.asarray(rows, dtype=np.int64) << 32 | (np.asarray(cols, dtype=np.int64) & 0xFFFFFFFF)
+
+
+def line_cells(row0, col0, row1, col1):
+    """
+        The cells of a straight line from (row0, col0) to (row1, col1), both included. Like Bresenham's algorithm it steps
+        to whichever cell keeps closest to the line, but along one axis at a time, so every cell shares a side with the
+        one before and a dragged belt has no diagonal gaps.
+    """
+    row_steps, col_steps = abs(row1 - row0), abs(col1 - col0)
+    steps = row_steps + col_steps
+    if steps == 0:
+        return np.array([[row0, col0]], dtype=np.int64)
+
+    # Bresenham's integer error: after k steps, k * col_steps / steps of them went along the columns, rounded half up
+    k = np.arange(steps + 1, dtype=np.int64)
+    cols = (2 * k * col_steps + steps) // (2 * steps)
+    rows = k - cols
+    return np.stack([row0 + np.sign(row1 - row0) * rows, col0 + np.sign(col1 - col0) * cols], axis=1)
+
+
+def rect_cells(row0, col0, row1, col1):
+    """ The cells of the rectangle with corners (row0, col0) and (row1, col1), both included, row by row. """
+    rows, cols = np.mgrid[min(row0, row1):max(row0, row1) + 1, min(col0, col1):max(col0, col1) + 1]
+    return np.stack([rows.ravel(), cols.ravel()], axis=1)
 
 
 structure_manager = StructureManager()
\ No newline at end of file
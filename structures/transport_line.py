@@ -0,0 +1,374 @@
+from bisect import bisect_left
+from math import ceil, floor
+import numpy as np
+
+from constants import consts as c
+from structures.conveyor import Conveyor
+from structures.scheduler import scheduler
+
+"""
+    A transport line is a straight run of Conveyors pointing the same way, simulated as one belt.
+    Positions are measured in cells from the tail edge of the line, and the items on it are kept
+    head first together with the gaps between them:
+
+        gaps[0] = length - (position of the head item)
+        gaps[k] = (position of item k - 1) - (position of item k) - 1, the slack behind item k - 1
+
+    Items move exactly as ItemManager moves loose items: an item only moves up while the cell ahead
+    of it is free, so a flowing belt keeps a free cell between items, and a blocked one fills
+    every cell. An item with a cell of slack (gap >= 1) always moves along with the item in
+    front, so only the tight items and the ones behind a stopped item are visited, and a freely
+    flowing line costs O(1) per tick instead of O(items). The item grid is only rewritten when
+    some item may have crossed into the next cell.
+"""
+
+# row / column offsets of the four directions (up, right, down, left)
+ROW_STEP = [-1, 0, 1, 0]
+COL_STEP = [0, 1, 0, -1]
+DIRECTION_NAMES = ["up", "right", "down", "left"]
+# a cell and its four neighbours
+AROUND = [(0, 0)] + list(zip(ROW_STEP, COL_STEP))
+
+# steps summed in another order land a rounding error either side of a cell edge, so an item counts as on an edge within this
+EDGE = 1e-9
+
+
+def cell_of(coordinate):
+    """ The row or column an item at coordinate y or x is in, the same however the steps that got it there were summed. """
+    return floor(coordinate + EDGE)
+
+
+class TransportLine:
+    def __init__(self, cells, direction):
+        self.cells = cells
+        self.direction = direction
+        self.length = len(cells)
+        self.tail_row, self.tail_col = cells[0]
+        self.exit_row = cells[-1][0] + ROW_STEP[direction]
+        self.exit_col = cells[-1][1] + COL_STEP[direction]
+        self.forward = direction in (1, 2)  # heading towards growing rows or columns
+
+        self.items = []
+        self.gaps = []
+        self.tight = []  # indices of items less than a cell of slack behind the item ahead
+        self.packed = 1  # items before this index are known to be bunched up behind a blocked head
+
+        self.moved = 0.0
+        self.next_crossing = 1.0
+
+    def update(self, sm, im, lines):
+        if not self.items:
+            return
+
+        d = c.conveyor_speed * c.dt
+        exit_open = im.grid[self.exit_row][self.exit_col] == 0 and sm.item_can_be_placed(self.exit_row, self.exit_col)
+
+        if self.advance(d, exit_open):
+            self.moved += d
+
+        if exit_open and self.cell(self.length - self.gaps[0]) == self.length:
+            self.hand_off(im, lines)
+
+        if self.moved >= self.next_crossing - EDGE:
+            self.sync(im)
+
+    def advance(self, d, exit_open):
+        """ Move every item whose next cell is free by d, head first like ItemManager does, returning whether anything moved. """
+        gaps = self.gaps
+        n = len(gaps)
+
+        # the head only leaves the last cell when the exit is free
+        if exit_open or self.cell(self.length - gaps[0]) < self.length - 1:
+            gaps[0] -= d
+            mv = d
+            i = 1
+            self.packed = 1
+        else:
+            mv = 0.0
+            i = self.packed
+        ahead = self.length - gaps[0]  # where the item in front of item i is now
+        if i > 1:
+            ahead -= i - 1 + sum(gaps[1:i])
+
+        moved = mv > 0
+        tight = self.tight
+        retighten = False
+        while i < n:
+            if mv == d:
+                # an item a cell or more behind the one in front always has a free cell ahead
+                t = bisect_left(tight, i)
+                if t == len(tight):
+                    break
+                if tight[t] > i:
+                    ahead -= tight[t] - i + sum(gaps[i:tight[t]])
+                    i = tight[t]
+
+            g = gaps[i]
+            position = ahead - mv - g - 1
+            new_mv = d if self.cell(ahead) >= self.cell(position) + 2 else 0.0
+            if new_mv != mv:
+                gaps[i] = g + mv - new_mv
+                retighten = retighten or (g < 1) != (gaps[i] < 1)
+            if new_mv:
+                moved = True
+            elif not moved:
+                # everything up to here waits for the head, and keeps waiting while the head does
+                self.packed = i + 1
+
+            ahead = position + new_mv
+            mv = new_mv
+            i += 1
+
+        if retighten:
+            self.tight = [k for k in range(1, n) if gaps[k] < 1]
+
+        return moved
+
+    def hand_off(self, im, lines):
+        item = self.items[0]
+        overshoot = -self.gaps[0]
+        self.pop(0)
+
+        if im.grid[item.row][item.col] is item:
+            im.grid[item.row][item.col] = 0
+            scheduler.notify(item.row, item.col)
+
+        item.row, item.col = self.exit_row, self.exit_col
+        item.x = self.exit_col + 0.5 + (overshoot - 0.5) * COL_STEP[self.direction]
+        item.y = self.exit_row + 0.5 + (overshoot - 0.5) * ROW_STEP[self.direction]
+        item.last_dir = DIRECTION_NAMES[self.direction]
+        im.grid[item.row][item.col] = item
+        scheduler.notify(item.row, item.col)
+
+        next_line = lines.line_at(item.row, item.col)
+        if next_line is not None:
+            next_line.insert(item, im)
+        else:
+            im.free(item)
+
+    def positions(self):
+        positions = []
+        position = self.length
+        for gap in self.gaps:
+            position -= gap
+            positions.append(position)
+            position -= 1
+        return positions
+
+    def cell(self, position):
+        """ The index of the cell an item at position is in, found as cell_of finds it from the item's x or y. """
+        # an item heading right or down is in the next cell on reaching its edge, one heading left or up only once past it
+        if self.forward:
+            return floor(position + EDGE)
+        return ceil(position - EDGE) - 1
+
+    def cell_index(self, position):
+        return min(max(self.cell(position), 0), self.length - 1)
+
+    def sync(self, im):
+        """ Write the cells the items are now in back to the item grid. """
+        self.moved = 0.0
+        self.next_crossing = 1.0
+
+        behind = self.length
+        for item, position in zip(self.items, self.positions()):
+            # never let rounding put two items in one cell
+            behind = min(self.cell_index(position), behind - 1)
+            row, col = self.cells[behind]
+            if (row, col) != (item.row, item.col):
+                if im.grid[item.row][item.col] is item:
+                    im.grid[item.row][item.col] = 0
+                    scheduler.notify(item.row, item.col)
+                im.grid[row][col] = item
+                scheduler.notify(row, col)
+                item.row, item.col = row, col
+
+            self.next_crossing = min(self.next_crossing, self.cell(position) + 1 - position)
+
+    def place(self, item, position):
+        item.x = self.tail_col + 0.5 + (position - 0.5) * COL_STEP[self.direction]
+        item.y = self.tail_row + 0.5 + (position - 0.5) * ROW_STEP[self.direction]
+
+    def position_of(self, item):
+        """ Project an item in one of the line's cells onto the belt, keeping it inside that cell. """
+        index = self.cells.index((item.row, item.col))
+        along = (item.x - self.tail_col - 0.5) * COL_STEP[self.direction] + (item.y - self.tail_row - 0.5) * ROW_STEP[self.direction]
+        return min(max(along + 0.5, index), index + 0.999)
+
+    def insert(self, item, im):
+        """ Take over an item sitting in one of the line's cells. """
+        position = self.position_of(item)
+        positions = self.positions()
+        k = bisect_left([-p for p in positions], -position)
+
+        self.items.insert(k, item)
+        self.gaps.insert(k, self.length - position if k == 0 else positions[k - 1] - position - 1)
+        if k + 1 < len(self.gaps):
+            self.gaps[k + 1] = position - positions[k] - 1
+
+        item.line = self
+        item.last_dir = DIRECTION_NAMES[self.direction]
+        im.grid[item.row][item.col] = item
+        self.reindex()
+        self.sync(im)
+
+    def adopt(self, items, im):
+        """ Take over a batch of items sitting in the line's cells, as when the line is (re)built. """
+        placed = sorted(((self.position_of(item), item) for item in items), key=lambda pair: -pair[0])
+        ahead = self.length + 1
+        for position, item in placed:
+            self.items.append(item)
+            self.gaps.append(ahead - position - 1)
+            item.line = self
+            item.last_dir = DIRECTION_NAMES[self.direction]
+            ahead = position
+
+        self.reindex()
+        self.sync(im)
+
+    def pop(self, k):
+        """ Take item k off the line, closing the gap it leaves behind. """
+        item = self.items.pop(k)
+        gap = self.gaps.pop(k)
+        if k < len(self.gaps):
+            self.gaps[k] += gap + 1
+
+        item.line = None
+        self.reindex()
+        return item
+
+    def discard(self, item):
+        self.pop(self.items.index(item))
+
+    def reindex(self):
+        self.tight = [k for k in range(1, len(self.gaps)) if self.gaps[k] < 1]
+        self.packed = 1
+
+    def release(self, im):
+        """ Put every item back into the item manager as a free item, ready for the line to be rebuilt. """
+        self.sync(im)
+        for item, position in zip(self.items, self.positions()):
+            self.place(item, position)
+            item.line = None
+            im.free(item)
+        self.items = []
+        self.gaps = []
+
+    def place_items(self):
+        """ Set every item's x and y from where it is on the belt, for drawing. """
+        for item, position in zip(self.items, self.positions()):
+            self.place(item, position)
+
+    def render(self):
+        self.place_items()
+        for item in self.items:
+            item.render()
+
+
+class TransportLineManager:
+    def __init__(self):
+        self.lines = []
+        self.cell_lines = {}
+
+    def update(self, sm, im):
+        for line in self.lines:
+            line.update(sm, im, self)
+
+    def line_at(self, row, col):
+        return self.cell_lines.get((row, col))
+
+    def rebuild_around(self, sm, im, cells):
+        """ Re-detect the lines through the given cells and their neighbours after conveyors were added, removed or rotated there. """
+        line_at = self.cell_lines.get
+        dissolved = {line_at((row + row_step, col + col_step)) for row, col in cells for row_step, col_step in AROUND}
+        dissolved.discard(None)
+
+        cells = set(cells)
+        for line in dissolved:
+            cells.update(line.cells)
+            line.release(im)
+            for cell in line.cells:
+                del self.cell_lines[cell]
+        if dissolved:
+            self.lines = [line for line in self.lines if line not in dissolved]
+
+        conveyors = {}
+        for cell in cells:
+            structure = sm.grid.get(*cell)
+            if type(structure) == Conveyor:
+                conveyors[cell] = structure
+
+        adopted = []
+        for line in self.detect(conveyors):
+            items = [item for item in (im.grid.get(*cell) for cell in line.cells) if item != 0]
+            if items:
+                line.adopt(items, im)
+                adopted.extend(items)
+
+        if adopted:
+            im.adopted(adopted)
+
+    def snapshot(self, first_row):
+        """ Columns of the lines, in update order, whose items are item rows first_row onwards. """
+        lines = self.lines
+        lengths = [len(line.items) for line in lines]
+        return {
+            "lines.tail": np.array([(line.tail_row, line.tail_col) for line in lines], dtype=np.int32).reshape(-1, 2),
+            "lines.moved": np.array([line.moved for line in lines], dtype=np.float64),
+            "lines.next_crossing": np.array([line.next_crossing for line in lines], dtype=np.float64),
+            "lines.packed": np.array([line.packed for line in lines], dtype=np.int32),
+            "lines.offsets": first_row + np.cumsum([0] + lengths, dtype=np.int64),
+            "lines.gaps": np.array([gap for line in lines for gap in line.gaps], dtype=np.float64),
+        }
+
+    def restore(self, arrays, items):
+        """ Refill the rebuilt lines from a snapshot and put them back in their saved order. """
+        offsets = arrays["lines.offsets"].tolist()
+        gaps = arrays["lines.gaps"].tolist()
+        first = offsets[0]
+
+        ordered = []
+        for k, (tail_row, tail_col) in enumerate(arrays["lines.tail"].tolist()):
+            line = self.cell_lines[(tail_row, tail_col)]
+            line.items = items[offsets[k]:offsets[k + 1]]
+            line.gaps = gaps[offsets[k] - first:offsets[k + 1] - first]
+            for item in line.items:
+                item.line = line
+            line.reindex()
+            line.packed = int(arrays["lines.packed"][k])
+            line.moved = float(arrays["lines.moved"][k])
+            line.next_crossing = float(arrays["lines.next_crossing"][k])
+            ordered.append(line)
+
+        self.lines = ordered
+
+    def rebuild(self, sm):
+        """ Detect every line from scratch, leaving them empty, as when a save is loaded. """
+        self.lines = []
+        self.cell_lines = {}
+        self.detect({(structure.row, structure.col): structure for structure in sm.structures if type(structure) == Conveyor})
+
+    def detect(self, conveyors):
+        """ Create a line for every straight run among the given conveyors, keyed by cell, and return them. """
+        lines = []
+        for (row, col), conveyor in conveyors.items():
+            direction = conveyor.direction
+            behind = (row - ROW_STEP[direction], col - COL_STEP[direction])
+            if behind in conveyors and conveyors[behind].direction == direction:
+                continue
+
+            # walk forward from each tail while the next cell continues the run
+            run = [(row, col)]
+            while True:
+                ahead = (run[-1][0] + ROW_STEP[direction], run[-1][1] + COL_STEP[direction])
+                if ahead not in conveyors or conveyors[ahead].direction != direction:
+                    break
+                run.append(ahead)
+
+            line = TransportLine(run, direction)
+            lines.append(line)
+            for cell in run:
+                self.cell_lines[cell] = line
+
+        self.lines.extend(lines)
+        return lines
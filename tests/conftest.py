@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# sprites, sounds and fonts are loaded relative to the working directory
+os.chdir(ROOT)
+
+import headless  # noqa: F401, E402, selects the dummy SDL drivers before pygame is initialised
+
+"""
+    The managers are module-level singletons, so tests share one game. The fresh_game fixture puts
+    it back to an empty world before a test by restoring a capture of the game taken before any
+    test built anything.
+"""
+
+
+@pytest.fixture(scope="session")
+def empty_game():
+    import save
+    return save.capture()
+
+
+@pytest.fixture
+def fresh_game(empty_game):
+    import save
+    from bench import layouts
+    from constants import consts as c
+    from history import history
+
+    save.restore(empty_game)
+    history.clear()
+    layouts.sources.clear()
+    layouts.sinks.clear()
+    ug_state = c.ug_state
+    yield
+    c.ug_state = ug_state
@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+import autosave as autosaving
+import save
+from autosave import Autosave
+from bench.layouts import build
+from id_mapping import id_map
+from items import item_manager as im
+from journal import journal
+from structures.production.factory import Factory
+from structures.structure import structure_manager as sm
+
+
+@pytest.fixture
+def save_dir(fresh_game, tmp_path, monkeypatch):
+    monkeypatch.setattr(save, "SAVE_DIR", str(tmp_path))
+    monkeypatch.setattr(autosaving, "AUTOSAVE", str(tmp_path / "autosave.npz"))
+    monkeypatch.setattr(autosaving, "JOURNAL", str(tmp_path / "journal-{:06d}.bin"))
+    yield tmp_path
+    journal.close()
+
+
+def layout():
+    return {sm.cells_of(s)[0]: (type(s).__name__, sm.built_direction(s), getattr(s, "length", 0), getattr(s, "recipe", None)) for s in sm.structures}
+
+
+def items():
+    return sorted((row, col) for row in range(-5, 60) for col in range(-5, 60) if im.grid[row][col] != 0)
+
+
+def game():
+    build("circuits", 30)
+    im.add(45, 0, id_map["iron"])
+
+
+def edit():
+    """ Some of every operation the journal records, returning how many records they make. """
+    sm.add_many([(40, col) for col in range(10)], id_map["conveyor"], 1, quiet=True)
+    sm.add(41, 0, id_map["splitter"], 2, quiet=True)
+    sm.remove(40, 3, quiet=True)
+    sm.rotate(40, 5, quiet=True)
+    factory = next(s for s in sm.structures if isinstance(s, Factory))
+    factory.set_recipe(0)
+    factory.clear_recipe()
+    im.remove(45, 0, by_player=True)
+    return 10 + 1 + 1 + 1 + 2 + 1
+
+
+def crash(autosave):
+    """ Stop like a killed game would: the last autosave finishes, the journal is left behind. """
+    autosave.wait()
+    journal.close()
+
+
+def test_recovery_replays_what_happened_since_the_checkpoint(save_dir, empty_game):
+    game()
+    first = Autosave()
+    assert first.begin() is None
+    operations = edit()
+    expected = layout(), items()
+    crash(first)
+
+    save.restore(empty_game)
+    second = Autosave()
+    assert second.begin() == operations
+    second.wait()
+    assert (layout(), items()) == expected
+
+
+def test_journals_before_the_latest_checkpoint_are_not_replayed(save_dir, empty_game):
+    game()
+    first = Autosave()
+    first.begin()
+    edit()
+    first.start()
+    first.wait()
+    assert first.journals() == [2]
+
+    sm.add(50, 50, id_map["conveyor"], 1, quiet=True)
+    expected = layout(), items()
+    crash(first)
+
+    save.restore(empty_game)
+    second = Autosave()
+    assert second.begin() == 1
+    second.wait()
+    assert (layout(), items()) == expected
+
+
+def test_a_clean_exit_leaves_only_the_checkpoint(save_dir):
+    game()
+    autosave = Autosave()
+    autosave.begin()
+    edit()
+    autosave.end()
+    assert os.listdir(save_dir) == ["autosave.npz"]
+    assert Autosave().begin() is None
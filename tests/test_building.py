@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+import blueprint
+from bench.layouts import build
+from id_mapping import id_map
+from items import item_manager as im
+from structures.structure import line_cells, rect_cells, structure_manager as sm
+
+
+def layout(first_row = -1000, first_col = -1000):
+    """ What is built where, relative to (first_row, first_col). """
+    return {(row - first_row, col - first_col): (type(s).__name__, sm.built_direction(s), getattr(s, "length", 0), getattr(s, "recipe", None))
+            for s in sm.structures for row, col in [sm.cells_of(s)[0]] if row >= first_row and col >= first_col}
+
+
+def test_line_cells_leave_no_gaps():
+    cells = line_cells(0, 0, 3, 10)
+    assert cells[0].tolist() == [0, 0] and cells[-1].tolist() == [3, 10]
+    assert len(cells) == 14
+    # every cell shares a side with the one before, so the belts link up
+    assert (np.abs(np.diff(cells, axis=0)).sum(axis=1) == 1).all()
+    assert line_cells(2, 2, 2, 2).tolist() == [[2, 2]]
+
+
+def test_rect_cells_take_the_corners_in_any_order():
+    cells = rect_cells(2, 3, 0, 1)
+    assert cells.tolist() == rect_cells(0, 1, 2, 3).tolist()
+    assert cells.tolist() == [[row, col] for row in range(3) for col in range(1, 4)]
+
+
+@pytest.mark.usefixtures("fresh_game")
+def test_add_many_leaves_out_occupied_and_repeated_cells():
+    sm.add(0, 2, id_map["arm"], 1, quiet=True)
+    placed = sm.add_many([(0, 0), (0, 1), (0, 1), (0, 2), (0, 3)], id_map["conveyor"], 1, quiet=True)
+    assert [(s.row, s.col) for s in placed] == [(0, 0), (0, 1), (0, 3)]
+    assert type(sm.grid[0][2]).__name__ == "Arm"
+
+
+@pytest.mark.usefixtures("fresh_game")
+def test_add_many_needs_the_far_end_of_an_underground_free():
+    sm.add(6, 4, id_map["conveyor"], 1, quiet=True)
+    assert sm.add_many([(6, 0)], id_map["conveyor_underground"], 1, lengths=4, quiet=True) == []
+    # nor may it land on one placed before it in the same call
+    placed = sm.add_many([(5, 0), (5, 4), (5, 1)], id_map["conveyor_underground"], 1, lengths=4, quiet=True)
+    assert [sm.cells_of(s)[0] for s in placed] == [(5, 0), (5, 1)]
+
+
+@pytest.mark.usefixtures("fresh_game")
+def test_add_many_builds_what_single_adds_build():
+    cells = rect_cells(0, 0, 3, 5)
+    types = np.resize([id_map["conveyor"], id_map["splitter"], id_map["furnace"]], len(cells))
+    sm.add_many(cells, types, 2, quiet=True)
+    placed = layout(), sorted(line.cells[0] for line in im.lines.lines)
+
+    for structure in list(sm.structures):
+        sm.remove(*sm.cells_of(structure)[0], quiet=True)
+    for (row, col), structure_type in zip(cells.tolist(), types.tolist()):
+        sm.add(row, col, structure_type, 2, quiet=True)
+    assert (layout(), sorted(line.cells[0] for line in im.lines.lines)) == placed
+
+
+@pytest.mark.usefixtures("fresh_game")
+def test_remove_many_takes_away_what_single_removes_take_away():
+    sm.add_many(rect_cells(0, 0, 3, 5), id_map["conveyor"], 2, quiet=True)
+    sm.add_many([(5, 0)], id_map["conveyor_underground"], 1, lengths=4, quiet=True)
+    sm.add(5, 8, id_map["arm"], 1, quiet=True)
+
+    # an underground goes by either end, each structure once
+    removed = sm.remove_many([(0, 0), (1, 2), (1, 2), (5, 4), (9, 9)], quiet=True)
+    assert len(removed) == 3 and (sm.type_grid[5, 0:8] == -1).all()
+    expected = layout(), sorted(line.cells[0] for line in im.lines.lines)
+
+    sm.add(0, 0, id_map["conveyor"], 2, quiet=True)
+    sm.add(1, 2, id_map["conveyor"], 2, quiet=True)
+    sm.remove(0, 0, quiet=True)
+    sm.remove(1, 2, quiet=True)
+    assert (layout(), sorted(line.cells[0] for line in im.lines.lines)) == expected
+    assert len(sm.structures) == 24 - 2 + 1
+
+
+@pytest.mark.usefixtures("fresh_game")
+def test_a_stamped_blueprint_copies_the_section_with_its_recipes():
+    build("circuits", 30)
+    section = {cell: built for cell, built in layout(0, 0).items() if cell[0] <= 3 and cell[1] <= 11}
+    copied = blueprint.capture(sm, 0, 0, 3, 11)
+    assert len(copied) == len(section)
+    assert any(recipe is not None for _, _, _, recipe in section.values())
+
+    placed = blueprint.stamp(sm, copied, 100, 0, quiet=True)
+    assert len(placed) == len(copied)
+    assert layout(100, 0) == section
+
+
+@pytest.mark.usefixtures("fresh_game")
+def test_a_blueprint_leaves_out_what_sticks_out_of_the_section():
+    sm.add(0, 0, id_map["conveyor"], 1, quiet=True)
+    sm.add_many([(1, 0)], id_map["conveyor_underground"], 1, lengths=4, quiet=True)
+    assert blueprint.capture(sm, 0, 0, 1, 3)["type"].tolist() == [id_map["conveyor"]]
@@ -0,0 +1,78 @@
+import numpy as np
+
+from chunked_grid import ChunkedGrid, MappedChunkedGrid
+from constants import consts as c
+
+
+def test_reads_the_fill_until_a_chunk_is_written():
+    grid = ChunkedGrid(-1, np.int32)
+    assert grid[5, 7] == -1 and grid[-100][3] == -1 and grid.get(10 ** 6, -10 ** 6) == -1
+    assert not grid.chunks
+
+    grid[-3, 1000] = 4
+    grid[0][0] = -1  # writing the fill allocates nothing
+    assert grid[-3][1000] == 4 and grid.get(-3, 1000) == 4
+    assert len(grid.chunks) == 1
+
+
+def test_vectorized_reads_and_writes_match_cell_access():
+    grid = ChunkedGrid(0, np.int64)
+    rng = np.random.default_rng(0)
+    cells = np.unique(rng.integers(-200, 200, (500, 2)), axis=0)
+    values = np.arange(1, len(cells) + 1)
+
+    grid[cells[:, 0], cells[:, 1]] = values
+    assert [grid[row, col] for row, col in cells.tolist()] == values.tolist()
+    assert np.array_equal(grid[cells[:, 0], cells[:, 1]], values)
+    assert grid[np.array([10 ** 6]), np.array([0])].tolist() == [0]
+    assert grid[0:2, -1:1].shape == (2, 2)
+
+
+def test_occupied_lists_the_cells_not_holding_the_fill():
+    grid = ChunkedGrid()
+    grid[1][2] = "a"
+    grid[-1][-40] = "b"
+    grid[70][70] = "c"
+    assert sorted(grid.occupied(-10, 10, -50, 50)) == [(-1, -40, "b"), (1, 2, "a")]
+
+
+def test_generator_fills_each_chunk_once_when_first_looked_at():
+    calls = []
+
+    def generator(chunk_row, chunk_col):
+        calls.append((chunk_row, chunk_col))
+        if chunk_col < 0:
+            return None
+        return np.full((c.chunk_size, c.chunk_size), 10 * chunk_row + chunk_col + 1)
+
+    grid = ChunkedGrid(0, np.int64, generator)
+    assert grid[0, -1] == 0
+    assert grid[c.chunk_size, 1] == 11 and grid[c.chunk_size + 1][2] == 11
+    assert grid[0, -1] == 0
+    assert calls == [(0, -1), (1, 0)]
+
+    # vectorized reads see chunks nothing looked at yet as the fill
+    assert grid[np.array([0]), np.array([0])].tolist() == [0]
+    assert calls == [(0, -1), (1, 0)]
+
+
+def test_set_chunk_does_not_run_the_generator():
+    calls = []
+    grid = ChunkedGrid(0, np.int64, lambda *key: calls.append(key))
+    grid.set_chunk(2, 3, np.full((c.chunk_size, c.chunk_size), 7))
+    assert grid[2 * c.chunk_size, 3 * c.chunk_size] == 7
+    assert calls == []
+
+
+def test_mapped_grid_keeps_its_chunks_across_reopening(tmp_path):
+    file_path = str(tmp_path / "layer")
+    grid = MappedChunkedGrid(file_path, -1, np.int8)
+    for k in range(10):
+        grid[k * c.chunk_size, -k * c.chunk_size] = k
+    grid.flush()
+
+    reopened = MappedChunkedGrid(file_path, -1, np.int8)
+    assert [reopened[k * c.chunk_size, -k * c.chunk_size] for k in range(10)] == list(range(10))
+    assert reopened[5, 5] == -1
+    assert len(reopened.chunks) == 10
+    assert len(MappedChunkedGrid(file_path, -1, np.int8, reset=True).chunks) == 0
@@ -0,0 +1,43 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pytest
+
+import contracts
+from contracts import matches
+
+
+def test_numpy_scalars_satisfy_the_builtin_types():
+    assert matches(np.bool_(True), bool)
+    assert matches(np.int16(3), int) and matches(np.int64(3), int)
+    assert matches(np.float32(1.5), float) and matches(np.int32(2), float)
+    assert not matches(1.5, int) and not matches(np.float64(1.0), int)
+
+
+def test_generic_hints():
+    assert matches(None, Optional[int]) and matches(4, Optional[int]) and not matches("4", Optional[int])
+    assert matches([1, np.int8(2)], List[int]) and not matches([1, "2"], List[int])
+    assert matches((1, "a"), Tuple[int, str]) and not matches((1,), Tuple[int, str])
+    assert matches({"a": 1.0}, Dict[str, float])
+
+
+def test_typechecked_is_free_while_contracts_are_off(monkeypatch):
+    monkeypatch.setattr(contracts, "ENABLED", False)
+
+    def half(value: int) -> float:
+        return value / 2
+
+    assert contracts.typechecked(half) is half
+
+
+def test_typechecked_checks_arguments_and_results_while_on(monkeypatch):
+    monkeypatch.setattr(contracts, "ENABLED", True)
+
+    @contracts.typechecked
+    def half(value: int) -> int:
+        return value / 2
+
+    with pytest.raises(TypeError, match="for value"):
+        half("2")
+    with pytest.raises(TypeError, match="returned"):
+        half(3)
@@ -0,0 +1,101 @@
+import pytest
+
+import history as h
+from bench.layouts import build
+from history import history
+from id_mapping import id_map
+from structures.production.factory import Factory
+from structures.structure import structure_manager as sm
+
+
+@pytest.fixture
+def recording(fresh_game):
+    history.enabled = True
+    yield
+    history.enabled = False
+    history.clear()
+
+
+def layout():
+    return {sm.cells_of(s)[0]: (type(s).__name__, sm.built_direction(s), getattr(s, "length", 0), getattr(s, "recipe", None)) for s in sm.structures}
+
+
+def test_nothing_is_recorded_until_history_is_turned_on(fresh_game):
+    build("circuits", 30)
+    assert history.pending == [] and not history.entries
+
+
+def test_a_drag_is_undone_and_redone_as_one(recording):
+    before = layout()
+    for col in range(20):
+        sm.add(0, col, id_map["conveyor"], 1, quiet=True)
+    history.commit()
+    after = layout()
+
+    assert history.undo(sm) and layout() == before
+    assert history.redo(sm) and layout() == after
+    assert not history.redo(sm)
+
+
+def test_removed_structures_come_back_with_their_recipes(recording):
+    build("circuits", 30)
+    history.clear()
+    before = layout()
+
+    for cell in list(before)[::2]:
+        sm.remove(*cell, quiet=True)
+    history.commit()
+    assert len(layout()) < len(before)
+
+    assert history.undo(sm)
+    assert layout() == before
+
+
+def test_bulk_changes_are_recorded_as_one_run(recording):
+    build("circuits", 30)
+    history.clear()
+    before = layout()
+
+    sm.remove_many(list(before), quiet=True)
+    assert len(history.pending) == 1
+    history.commit()
+    assert not sm.structures
+
+    assert history.undo(sm)
+    assert layout() == before
+    assert history.redo(sm) and not sm.structures
+
+
+def test_rotations_and_recipe_changes_are_undone(recording):
+    build("circuits", 30)
+    history.clear()
+    before = layout()
+
+    sm.rotate(0, 1, quiet=True)
+    factory = next(s for s in sm.structures if isinstance(s, Factory))
+    factory.set_recipe(0)
+    history.commit()
+    assert layout() != before
+
+    assert history.undo(sm)
+    assert layout() == before
+
+
+def test_a_new_change_drops_what_was_undone(recording):
+    sm.add(0, 0, id_map["conveyor"], 1, quiet=True)
+    history.commit()
+    history.undo(sm)
+    sm.add(5, 5, id_map["conveyor"], 1, quiet=True)
+    history.commit()
+    assert not history.redo(sm)
+
+
+def test_the_oldest_entries_are_dropped(recording, monkeypatch):
+    monkeypatch.setattr(h, "MAX_ENTRIES", 5)
+    for col in range(10):
+        sm.add(0, col, id_map["conveyor"], 1, quiet=True)
+        history.commit()
+    assert len(history.entries) == 5
+    while history.undo(sm):
+        pass
+    assert sorted(layout()) == [(0, col) for col in range(5)]
@@ -0,0 +1,38 @@
+import pytest
+
+from id_mapping import id_map
+from items import item_manager as im
+from recipes import recipe_inputs, recipe_outputs, recipe_sizes, recipe_times, recipes
+from structures.structure import structure_manager as sm
+
+
+def test_the_tables_hold_every_recipe():
+    assert recipe_inputs.shape == (len(recipes), len(id_map))
+    for k, recipe in enumerate(recipes):
+        assert {item: int(count) for item, count in enumerate(recipe_inputs[k]) if count} == recipe["inputs"]
+        assert recipe_sizes[k] == sum(recipe["inputs"].values())
+        assert recipe_outputs[k] == recipe["output"] and recipe_times[k] == recipe["time"]
+
+
+@pytest.mark.usefixtures("fresh_game")
+def test_a_factory_takes_only_what_its_recipe_still_needs():
+    circuit = next(k for k, recipe in enumerate(recipes) if recipe["name"] == "Circuit")
+    sm.add(0, 0, id_map["factory"], 1, quiet=True)
+    factory = sm.grid[0][0]
+    factory.set_recipe(circuit)
+
+    def feed(item):
+        im.add(0, 0, id_map[item])
+        factory.update(sm, im)
+
+    assert not factory.will_accept_item(id_map["coal"])
+    feed("copper_wire")
+    feed("copper_wire")
+    assert not factory.will_accept_item(id_map["copper_wire"]) and not factory.recipe_fulfilled()
+    feed("copper_wire")
+    assert factory.storage[id_map["copper_wire"]] == 2
+    feed("iron")
+    assert factory.recipe_fulfilled() and factory.stored == 3
+
+    factory.clear_recipe()
+    assert factory.stored == 0 and not factory.storage.any()
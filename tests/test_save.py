@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+import save
+from bench.layouts import LAYOUTS, build, exchange
+from constants import consts as c
+from id_mapping import id_map
+from items import item_manager as im
+from simulation import simulation
+from structures.scheduler import scheduler
+from structures.structure import structure_manager as sm
+from world import World, world as w
+
+pytestmark = pytest.mark.usefixtures("fresh_game")
+
+
+def run(ticks):
+    sunk = 0
+    for _ in range(ticks):
+        sunk += exchange()
+        simulation.step(1, 1 / 60)
+    return sunk
+
+
+def state():
+    items = sorted((row, col, item.item) for structure in sm.structures for row, col in sm.cells_of(structure)
+                   for item in [im.grid[row][col]] if item != 0)
+    return simulation.ticks, len(sm.structures), len(scheduler.active), items
+
+
+@pytest.mark.parametrize("layout", list(LAYOUTS))
+def test_a_loaded_game_carries_on_like_the_one_saved(layout, tmp_path):
+    build(layout, 60)
+    run(300)
+    file_path = save.save(str(tmp_path / "game.npz"))
+    expected = run(300), state()
+
+    save.load(file_path)
+    assert (run(300), state()) == expected
+
+
+def test_saves_of_another_version_are_refused(tmp_path):
+    arrays = save.capture()
+    arrays["version"] = np.array(save.VERSION - 1)
+    with pytest.raises(ValueError):
+        save.restore(arrays)
+
+
+def test_loading_keeps_the_ore_without_generating_it_again(monkeypatch):
+    for key in [(0, 0), (3, -2), (-5, 7)]:
+        w.grid.chunks.get(key)
+    w.mine(*np.argwhere(w.grid.chunks[(0, 0)])[0].tolist())
+    arrays = save.capture()
+
+    calls = []
+    generate = World.generate
+    monkeypatch.setattr(World, "generate", lambda world, *key: calls.append(key) or generate(world, *key))
+    save.restore(arrays)
+    assert calls == []
+    again = save.capture()
+    for name in ["world.seed", "world.chunks", "world.ore", "world.amounts"]:
+        assert np.array_equal(again[name], arrays[name])
+
+
+def test_loading_a_mapped_world_puts_back_the_ore_mined_since(tmp_path):
+    w.open(str(tmp_path / "world"))
+    w.set_ore(0, 0, id_map["iron_ore"], 3)
+    w.mine(0, 0)
+    far = (40 * c.chunk_size, 40 * c.chunk_size)
+    generated = int(w.grid[far]), int(w.amounts[far])
+    file_path = save.save(str(tmp_path / "game.npz"))
+
+    w.mine(0, 0)
+    w.mine(0, 0)
+    w.set_ore(*far, id_map["coal"], 1)
+    w.mine(*far)
+    assert w.grid[0, 0] == 0
+
+    save.load(file_path)
+    assert (w.grid[0, 0], w.amounts[0, 0]) == (id_map["iron_ore"], 2)
+    assert (w.grid[far], w.amounts[far]) == generated
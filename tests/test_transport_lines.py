@@ -0,0 +1,98 @@
+import pytest
+
+from bench.layouts import DOWN, RIGHT, belt, exchange, place, source
+from id_mapping import id_map
+from items import item_manager as im
+from simulation import simulation
+from structures.structure import structure_manager as sm
+from structures.transport_line import COL_STEP, ROW_STEP, TransportLineManager
+
+pytestmark = pytest.mark.usefixtures("fresh_game")
+
+
+def lines():
+    return sorted((line.cells[0], line.length, line.direction) for line in im.lines.lines)
+
+
+def items_on_lines():
+    return sum(len(line.items) for line in im.lines.lines)
+
+
+def test_a_straight_run_is_one_line():
+    belt(0, 0, 10)
+    assert lines() == [((0, 0), 10, RIGHT)]
+
+
+def test_filling_a_gap_merges_two_lines_and_keeps_their_items():
+    belt(0, 0, 4, items="iron")
+    belt(0, 5, 4, items="copper")
+    assert len(lines()) == 2
+
+    sm.add(0, 4, id_map["conveyor"], RIGHT, quiet=True)
+    assert lines() == [((0, 0), 9, RIGHT)]
+    assert items_on_lines() == 8 and not im.items
+    assert all(item.line is im.lines.lines[0] for item in im.lines.lines[0].items)
+
+
+def test_removing_a_conveyor_splits_its_line():
+    belt(0, 0, 9, items="iron")
+    sm.remove(0, 4, quiet=True)
+    assert lines() == [((0, 0), 4, RIGHT), ((0, 5), 4, RIGHT)]
+    # the item left on bare ground is a loose item again
+    assert items_on_lines() == 8 and len(im.items) == 1
+
+
+def test_rotating_a_conveyor_splits_its_line():
+    belt(0, 0, 5)
+    sm.rotate(0, 2, quiet=True)
+    assert lines() == [((0, 0), 2, RIGHT), ((0, 2), 1, DOWN), ((0, 3), 2, RIGHT)]
+
+
+def test_items_follow_lines_around_a_corner():
+    belt(10, 0, 3)
+    belt(10, 3, 3, DOWN)
+    im.add(10, 0, id_map["iron"])
+    simulation.step(600, 1 / 60)
+    # past the end of the last line the item is handed on to the bare cell and stops there
+    assert [(row, col) for row in range(9, 15) for col in range(0, 5) if im.grid[row][col] != 0] == [(13, 3)]
+
+
+def test_a_blocked_line_bunches_its_items_up():
+    belt(0, 0, 6, items="iron")
+    sm.add(0, 6, id_map["furnace"], RIGHT, quiet=True)
+    simulation.step(600, 1 / 60)
+    line = im.lines.line_at(0, 0)
+    assert len(line.items) == 6
+    assert [im.grid[0][col] != 0 for col in range(6)] == [True] * 6
+    assert line.gaps[1:] == pytest.approx([0] * 5)
+
+
+def fed_belt(row, col, length, direction):
+    """ Lay a straight belt with iron fed onto its tail, returning the cell just past its head. """
+    for k in range(length):
+        place(row + k * ROW_STEP[direction], col + k * COL_STEP[direction], "conveyor", direction)
+    source(row, col, "iron")
+    return row + length * ROW_STEP[direction], col + length * COL_STEP[direction]
+
+
+@pytest.mark.parametrize("direction", range(4))
+def test_a_line_moves_items_like_loose_items_on_conveyors(monkeypatch, direction):
+    ends = [fed_belt(0, 0, 10, direction)]
+    with monkeypatch.context() as patch:
+        # the same belt again, but left as single conveyors
+        patch.setattr(TransportLineManager, "detect", lambda self, conveyors: [])
+        ends.append(fed_belt(100, 100, 10, direction))
+    assert im.lines.line_at(0, 0) is not None and im.lines.line_at(100, 100) is None
+
+    sunk = [[], []]
+    for tick in range(3000):
+        exchange()
+        for k, (row, col) in enumerate(ends):
+            if im.grid[row][col] != 0:
+                im.remove(row, col)
+                sunk[k].append(tick)
+        simulation.step(1, 1 / 60)
+
+    # a flowing belt keeps a free cell between items either way
+    assert len(sunk[0]) > 20
+    assert sunk[0] == sunk[1]
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from constants import consts as c
+from id_mapping import id_map
+from world import ORE_AMOUNT, World, noise, world as w
+
+KEYS = [(0, 0), (0, 1), (3, -2), (-5, 7)]
+
+
+def chunks(world, keys):
+    return [world.grid.chunks.get(key) for key in keys]
+
+
+def test_noise_depends_only_on_the_seed_and_the_cell():
+    rows, cols = np.mgrid[-50:50, 200:300]
+    first = noise(7, 0, rows, cols, 12)
+    assert np.array_equal(first, noise(7, 0, rows, cols, 12))
+    assert not np.array_equal(first, noise(8, 0, rows, cols, 12))
+    assert not np.array_equal(first, noise(7, 1, rows, cols, 12))
+    assert first.min() >= 0 and first.max() < 1
+
+
+def test_noise_varies_smoothly():
+    rows, cols = np.mgrid[0:100, 0:100]
+    field = noise(3, 0, rows, cols, 12)
+    assert np.abs(np.diff(field, axis=0)).max() < 0.2 and np.abs(np.diff(field, axis=1)).max() < 0.2
+
+
+def test_a_chunk_comes_out_the_same_whatever_was_generated_first():
+    first, second, other = World(), World(), World()
+    first.reset(5)
+    second.reset(5)
+    other.reset(6)
+
+    generated = chunks(first, KEYS)
+    assert all(np.array_equal(a, b) for a, b in zip(generated, chunks(second, KEYS[::-1])[::-1]))
+    assert any(chunk is not None for chunk in generated)
+    assert not all(np.array_equal(a, b) for a, b in zip(generated, chunks(other, KEYS)))
+
+
+def test_generated_ore_has_an_amount_and_bare_ground_none():
+    world = World()
+    world.reset(11)
+    for key, chunk in zip(KEYS, chunks(world, KEYS)):
+        if chunk is not None:
+            amounts = world.amounts.chunk(*key)
+            assert ((amounts > 0) == (chunk != 0)).all()
+            assert set(np.unique(chunk)) <= {0, id_map["coal"], id_map["iron_ore"], id_map["copper_ore"]}
+
+
+@pytest.mark.usefixtures("fresh_game")
+def test_mining_runs_a_cell_out():
+    row = col = 100 * c.chunk_size
+    w.set_ore(row, col, id_map["iron_ore"], amount=3)
+    assert [w.mine(row, col) for _ in range(3)] == [2, 1, 0]
+    assert w.grid[row, col] == 0
+
+    # ore placed without an amount holds the default
+    w.set_ore(row, col, id_map["iron_ore"])
+    assert w.mine(row, col) == ORE_AMOUNT - 1
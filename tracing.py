@@ -0,0 +1,95 @@
+import json
+import os
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from os import makedirs, path
+from threading import get_ident
+from time import perf_counter
+
+"""
+    Timeline tracing. While enabled, the phases of every frame and a few known slow spots (the
+    recipe selection, rescaling the sprites on zoom) are recorded as spans into a ring buffer that
+    keeps the most recent CAPACITY of them. dump() writes the buffer as a Chrome trace-event file,
+    which chrome://tracing and ui.perfetto.dev open as a timeline. In game F4 starts recording and
+    dumps the trace when pressed again. With PYFACTORY_TRACE=1 in the environment recording starts
+    with the game and the trace is dumped when it exits.
+
+    A span for every structure update is only recorded while structures is set as well (F2 in
+    game), as timing each update costs more than the update itself for most structures. These
+    spans keep the structure's class name and cell, not the structure, so the buffer doesn't hold
+    on to removed ones.
+"""
+
+CAPACITY = 2 ** 18
+TRACE_DIR = "traces"
+ENABLED = os.environ.get("PYFACTORY_TRACE", "0") not in ["", "0"]
+
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.structures = False  # also record a span per structure update
+        self.spans = deque(maxlen=CAPACITY)  # (name, category, start, end, thread, (row, col) or None)
+        self.origin = perf_counter()
+        self.main_thread = get_ident()
+
+    def record(self, name, category, start, end, cell = None):
+        """ Record a span of the main thread, with start and end taken from perf_counter. """
+        self.spans.append((name, category, start, end, self.main_thread, cell))
+
+    def toggle(self):
+        """ Start recording afresh, or stop and return the path the trace was written to. """
+        self.enabled = not self.enabled
+        if self.enabled:
+            self.spans.clear()
+            return None
+        return self.dump()
+
+    def toggle_structures(self):
+        self.structures = not self.structures
+
+    @contextmanager
+    def span(self, name, category = "task"):
+        if not self.enabled:
+            yield
+            return
+
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append((name, category, start, perf_counter(), get_ident(), None))
+
+    def dump(self, file_path = None):
+        """ Write the recorded spans as a Chrome trace, returning the path written to. """
+        if file_path is None:
+            makedirs(TRACE_DIR, exist_ok=True)
+            file_path = path.join(TRACE_DIR, datetime.now().strftime("trace-%Y%m%d-%H%M%S.json"))
+
+        threads = {self.main_thread: 0}
+        events = [{"name": "thread_name", "ph": "M", "pid": 0, "tid": 0, "args": {"name": "main"}}]
+        for name, category, start, end, thread, cell in list(self.spans):
+            if thread not in threads:
+                threads[thread] = len(threads)
+                events.append({"name": "thread_name", "ph": "M", "pid": 0, "tid": threads[thread], "args": {"name": f"worker {threads[thread]}"}})
+
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": 1e6 * (start - self.origin),
+                "dur": 1e6 * (end - start),
+                "pid": 0,
+                "tid": threads[thread],
+            }
+            if cell is not None:
+                event["args"] = {"row": cell[0], "col": cell[1]}
+            events.append(event)
+
+        with open(file_path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+        return file_path
+
+
+tracer = Tracer()
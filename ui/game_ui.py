@@ -1,9 +1,12 @@
 from os import path
+from time import time
 import pygame as pg
 
 from constants import consts as c
 from loader import get_resource_path
 
+MESSAGE_SECONDS = 3  # how long a message from show stays on screen
+
 
 class UI:
     def __init__(self):
@@ -25,6 +28,9 @@ class UI:
         for i in range(len(self.sprites)):
             self.numbers.append(c.merriweather.render(str(i + 1), True, pg.Color("white")))
 
+        self.message = None
+        self.message_until = 0.0
+
     def load_scale_image(self, name):
         image_path = path.join(get_resource_path(path.join("sprites", name + ".png")))
         image = pg.image.load(image_path)
@@ -46,6 +52,18 @@ class UI:
 
             c.screen.blit(self.numbers[i], (x + self.numbers[i].get_width() // 2, y - 1 * c.ui_icon_size))
 
+        if self.message is not None and time() < self.message_until:
+            # top middle of the screen, under the title
+            text = c.merriweather.render(self.message, True, pg.Color("white"))
+            x = (c.sw - text.get_width()) / 2
+            pg.draw.rect(c.screen, pg.Color("black"), (x, 2.5 * c.title_font_size, text.get_width(), 2 * text.get_height()))
+            c.screen.blit(text, (x, 3 * c.title_font_size))
+
+    def show(self, message):
+        """ Show a message, e.g. that the game was saved, for MESSAGE_SECONDS. Safe to call from other threads. """
+        self.message = message
+        self.message_until = time() + MESSAGE_SECONDS
+
     def render_text(self, text):
         # top left of the screen
         text = c.merriweather.render(text, True, pg.Color("white"))
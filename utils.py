@@ -108,10 +108,3 @@ def draw_source(source_x, source_y, state):
     x = source_x + translations[state][0] * c.cell_length
     y = source_y + translations[state][1] * c.cell_length
     pg.draw.rect(c.screen, c.source_color, (x, y, c.cell_length, c.cell_length), 3)
-
-
-def draw_gridlines():
-    for x in range(0, c.num_cells * c.cell_length, c.cell_length):
-        pg.draw.line(c.screen, c.grid_color, (x - c.player_x, 0), (x - c.player_x, c.sh))
-    for y in range(0, c.num_cells * c.cell_length, c.cell_length):
-        pg.draw.line(c.screen, c.grid_color, (0, y - c.player_y), (c.sw, y - c.player_y))
\ No newline at end of file
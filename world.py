@@ -1,32 +1,154 @@
+import os
+import numpy as np
 import pygame as pg
-from numpy import zeros
-
+from chunked_grid import ChunkedGrid, MappedChunkedGrid
 from constants import consts as c
 from id_mapping import id_map, reverse_id_map
 
+"""
+    The ore under the factory. Ore fields are generated procedurally from the world's seed, a
+    chunk at a time and only when something first looks at the chunk, so creating a world costs
+    nothing however large the map is. Each ore has its own value noise: random values on a coarse
+    lattice, hashed from the seed and the lattice point, smoothly interpolated in between. A cell
+    is ore where one of them rises above ORE_THRESHOLD, of the kind whose noise is highest. As
+    the noise only depends on the seed and the cell, a chunk comes out the same every time and
+    fields continue seamlessly across chunk borders.
+
+    Ore runs out. A second layer, chunked like the ore, holds how much is left in every ore cell,
+    more towards the middle of a field. Mining takes one unit with a single cell lookup, and a
+    cell mined out turns into bare ground. An ore cell whose amount is 0 was never given one (ore
+    placed with set_ore, or a world from before amounts) and holds ORE_AMOUNT.
+
+    The chunks mining or set_ore changed are kept track of, in the directory of a mapped world as
+    well, as they are all a save of a mapped world has to hold for its ore to be restored.
+"""
+
+ORES = ["coal", "iron_ore", "copper_ore"]
+ORE_SCALE = 12         # cells between lattice points of the coarse noise, roughly the size of a field
+ORE_THRESHOLD = 0.76   # noise above which a cell is ore
+ORE_AMOUNT = 300       # units of ore in a cell at the edge of a field, up to four times as much in the middle
+
 
 class World:
     def __init__(self):
-        self.grid = zeros((c.num_cells, c.num_cells), dtype=int)
-        self.ore_locations = []
-
-        self.grid[10:13, 10:12] = id_map["coal"]
-        self.grid[15:17, 15:17] = id_map["iron_ore"]
-        self.grid[15:17, 20:23] = id_map["copper_ore"]
-        self.populate_ore_locations()
-
-    def populate_ore_locations(self):
-        for row in range(c.num_cells):
-            for col in range(c.num_cells):
-                if self.grid[row, col] > 0:
-                    self.ore_locations.append((row, col))
-
-    def render(self):
-        for loc in self.ore_locations:
-            row, col = loc
-            x = col * c.cell_length - c.player_x
-            y = row * c.cell_length - c.player_y
-            pg.draw.rect(c.screen, c.ore_colors[self.grid[loc]], (x, y, c.cell_length, c.cell_length))
+        self.seed = c.world_seed
+        self.ore_index = {}  # chunk coordinate -> rows, cols and kinds of the ore cells in it, built on demand
+        self.changed = {}    # chunk coordinate -> None for the chunks mined, set with set_ore or loaded from a save
+        if c.world_dir is not None:
+            self.open(c.world_dir)
+        else:
+            self.reset(self.seed)
+
+    def open(self, directory):
+        """ Use the ore layer stored in directory, which is created if it doesn't exist yet. """
+        os.makedirs(directory, exist_ok=True)
+        # a world keeps the seed it was created with, chunks nobody looked at yet are generated from it
+        seed_path = os.path.join(directory, "seed.npy")
+        if os.path.exists(seed_path):
+            self.seed = int(np.load(seed_path))
+        else:
+            np.save(seed_path, np.array(self.seed, dtype=np.int64))
+
+        self.amounts = MappedChunkedGrid(os.path.join(directory, "amounts"), 0, np.int32)
+        self.grid = MappedChunkedGrid(os.path.join(directory, "ore"), 0, int, generator=self.generate)
+        self.ore_index = {}
+
+        changed_path = os.path.join(directory, "changed.npy")
+        keys = np.load(changed_path).tolist() if os.path.exists(changed_path) else []
+        self.changed = dict.fromkeys(map(tuple, keys))
+
+    def reset(self, seed):
+        """ Start over with an empty ore layer in RAM, as when a save is loaded. """
+        self.seed = seed
+        self.amounts = ChunkedGrid(0, np.int32)
+        self.grid = ChunkedGrid(0, int, self.generate)
+        self.ore_index = {}
+        self.changed = {}
+
+    def layer(self, name, fill, dtype):
+        """ A new, empty grid for a layer of the world, mapped to a file next to the ore if the ore is. """
+        if isinstance(self.grid, MappedChunkedGrid):
+            return MappedChunkedGrid(os.path.join(os.path.dirname(self.grid.file_path), name), fill, dtype, reset=True)
+        return ChunkedGrid(fill, dtype)
+
+    def flush(self):
+        if isinstance(self.grid, MappedChunkedGrid):
+            self.grid.flush()
+            self.amounts.flush()
+            directory = os.path.dirname(self.grid.file_path)
+            temporary = os.path.join(directory, "changed.tmp.npy")
+            np.save(temporary, np.array(list(self.changed), dtype=np.int64).reshape(-1, 2))
+            os.replace(temporary, os.path.join(directory, "changed.npy"))
+
+    def set_chunk(self, chunk_row, chunk_col, ore, amounts):
+        """ Set the ore and amounts of a whole chunk, as when a save is loaded. """
+        self.grid.set_chunk(chunk_row, chunk_col, ore)
+        self.amounts.set_chunk(chunk_row, chunk_col, amounts)
+        self.ore_index.pop((chunk_row, chunk_col), None)
+        self.changed[(chunk_row, chunk_col)] = None
+
+    def regenerate(self, chunk_row, chunk_col):
+        """ Put a chunk back the way it was generated, undoing mining and set_ore. """
+        self.amounts.set_chunk(chunk_row, chunk_col, 0)
+        ore = self.generate(chunk_row, chunk_col)
+        self.grid.set_chunk(chunk_row, chunk_col, 0 if ore is None else ore)
+        self.ore_index.pop((chunk_row, chunk_col), None)
+        self.changed.pop((chunk_row, chunk_col), None)
+
+    def generate(self, chunk_row, chunk_col):
+        """ The ore of a chunk, None if it has none. """
+        rows, cols = np.mgrid[0:c.chunk_size, 0:c.chunk_size]
+        rows += chunk_row * c.chunk_size
+        cols += chunk_col * c.chunk_size
+
+        # two octaves, the finer one roughening the edges of the fields
+        fields = np.stack([0.7 * noise(self.seed, k, rows, cols, ORE_SCALE) + 0.3 * noise(self.seed, k + len(ORES), rows, cols, ORE_SCALE / 3)
+                           for k in range(len(ORES))])
+        strongest = fields.argmax(axis=0)
+        strength = fields.max(axis=0)
+        is_ore = strength > ORE_THRESHOLD
+        if not is_ore.any():
+            return None
+
+        richness = (strength - ORE_THRESHOLD) / (1 - ORE_THRESHOLD)
+        self.amounts.chunk(chunk_row, chunk_col)[:] = np.where(is_ore, ORE_AMOUNT * (1 + 3 * richness), 0)
+        return np.where(is_ore, np.array([id_map[ore] for ore in ORES])[strongest], 0)
+
+    def set_ore(self, row, col, ore, amount = 0):
+        self.grid[row, col] = ore
+        self.amounts[row, col] = amount
+        chunk = self.grid.chunk_of(row, col)
+        self.ore_index.pop(chunk, None)
+        self.changed[chunk] = None
+
+    def mine(self, row, col):
+        """ Take one unit of ore from a cell, returning how much is left. At 0 the cell has run out. """
+        left = int(self.amounts.get(row, col))
+        if left <= 0:
+            left = ORE_AMOUNT
+
+        left -= 1
+        if left == 0:
+            self.set_ore(row, col, 0)
+        else:
+            self.amounts.set(row, col, left)
+            self.changed[self.grid.chunk_of(row, col)] = None
+        return left
+
+    def ores(self, chunk_row, chunk_col):
+        """ Rows, columns and kinds of the ore cells in a chunk. """
+        key = (chunk_row, chunk_col)
+        if key not in self.ore_index:
+            chunk = self.grid.chunks.get(key)
+            if chunk is None:
+                rows = cols = kinds = np.zeros(0, dtype=np.int64)
+            else:
+                rows, cols = chunk.nonzero()
+                kinds = chunk[rows, cols]
+                rows = rows + chunk_row * c.chunk_size
+                cols = cols + chunk_col * c.chunk_size
+            self.ore_index[key] = rows, cols, kinds
+        return self.ore_index[key]
 
     def render_tooltip(self, row, col):
         x, y = pg.mouse.get_pos()
@@ -36,4 +158,31 @@ class World:
         c.screen.blit(ore_text, (x + 20, y + 20))
 
 
-world = World()
\ No newline at end of file
+def noise(seed, octave, rows, cols, scale):
+    """ Value noise in [0, 1) at the given cells, varying smoothly over about scale cells. """
+    rows, cols = rows / scale, cols / scale
+    row0, col0 = np.floor(rows).astype(np.int64), np.floor(cols).astype(np.int64)
+    # smoothstep, so the slope doesn't jump at lattice lines
+    t, u = rows - row0, cols - col0
+    t, u = t * t * (3 - 2 * t), u * u * (3 - 2 * u)
+
+    top = lattice(seed, octave, row0, col0) * (1 - u) + lattice(seed, octave, row0, col0 + 1) * u
+    bottom = lattice(seed, octave, row0 + 1, col0) * (1 - u) + lattice(seed, octave, row0 + 1, col0 + 1) * u
+    return top * (1 - t) + bottom * t
+
+
+def lattice(seed, octave, rows, cols):
+    """ A random value in [0, 1) for every lattice point, always the same for the same seed, octave and point. """
+    h = rows.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    h ^= cols.astype(np.uint64) * np.uint64(0xC2B2AE3D27D4EB4F)
+    h ^= np.uint64((seed * 0x165667B19E3779F9 + octave * 0x27D4EB2F165667C5) & 0xFFFFFFFFFFFFFFFF)
+    # splitmix64's finalizer
+    h ^= h >> np.uint64(30)
+    h *= np.uint64(0xBF58476D1CE4E5B9)
+    h ^= h >> np.uint64(27)
+    h *= np.uint64(0x94D049BB133111EB)
+    h ^= h >> np.uint64(31)
+    return (h >> np.uint64(11)) * (1.0 / (1 << 53))
+
+
+world = World()